@@ -6,11 +6,9 @@ from dotenv import load_dotenv
 # Load environment variables first, before any other imports
 load_dotenv()
 
-from md_server.cli.main import cli
-from md_server.logging_config import setup_logging, get_logger
+from md_server.cli.main import cli  # Sets up logging
+from md_server.logging_config import get_logger
 
-# Setup logging for CLI usage
-setup_logging()
 logger = get_logger(__name__)
 
 if __name__ == "__main__":
@@ -6,5 +6,15 @@ A tiny markdown preview server for your services.
 __version__ = "0.1.0"
 __author__ = "squid1127"
 
-from .main import app  # noqa: F401
-from .cli import cli  # noqa: F401
\ No newline at end of file
+
+def __getattr__(name: str):
+    """Import the web app and CLI on first access, so importing one doesn't load the other."""
+    if name == "app":
+        from .main import app
+
+        return app
+    if name == "cli":
+        from .cli.main import cli
+
+        return cli
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
@@ -2,17 +2,31 @@
 API module for the markdown server.
 """
 
-from fastapi import APIRouter, Depends, Request
+import base64
+import binascii
+import datetime
+import json
+import os
+from typing import AsyncIterator
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from fastapi.responses import JSONResponse
 from starlette.status import HTTP_401_UNAUTHORIZED
 from .auth import verify_api_key
 from .constants import HOME_PAGE
 from .md import render_md_page
+from .metrics import document_size
 from .logging_config import get_logger
 
 logger = get_logger(__name__)
 router = APIRouter()
 
+# Documents per insert_many in /new/batch
+BATCH_INSERT_SIZE = int(os.getenv("BATCH_INSERT_SIZE", "500"))
+# Longest accepted NDJSON line (one document) in /new/batch
+BATCH_MAX_LINE_BYTES = int(os.getenv("BATCH_MAX_LINE_BYTES", str(16 * 1024 * 1024)))
+# Largest page size for /documents
+LIST_MAX_LIMIT = 500
+
 
 @router.get("/health", tags=["API"], name="Health Check x2")
 async def health_check():
@@ -53,6 +67,7 @@ async def new_markdown_document(request: Request, api_key=Depends(verify_api_key
         document = await create_markdown_document(
             title=str(title), content=str(content)
         )
+        document_size.observe(len(document.content), endpoint="new")
         logger.info(f"New markdown document created with ID: {document.doc_id}")
         return {
             "id": str(document.doc_id),
@@ -65,3 +80,196 @@ async def new_markdown_document(request: Request, api_key=Depends(verify_api_key
         return JSONResponse(
             status_code=500, content={"error": "Failed to create document"}
         )
+
+
+async def iter_ndjson_lines(stream: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[tuple[int, bytes | None]]:
+    """Split a streamed body into NDJSON lines as it arrives.
+
+    Yields (line number, line) pairs, skipping blank lines. Lines longer than
+    max_line_bytes are discarded without buffering them and yielded as None.
+    """
+    buffer = b""
+    line_no = 0
+    skipping = False
+    async for chunk in stream:
+        buffer += chunk
+        while True:
+            newline = buffer.find(b"\n")
+            if newline == -1:
+                break
+            line, buffer = buffer[:newline], buffer[newline + 1:]
+            line_no += 1
+            if skipping:
+                skipping = False
+                yield line_no, None
+            elif line.strip():
+                yield line_no, line if len(line) <= max_line_bytes else None
+        if len(buffer) > max_line_bytes:
+            skipping = True
+            buffer = b""
+    if skipping:
+        yield line_no + 1, None
+    elif buffer.strip():
+        yield line_no + 1, buffer if len(buffer) <= max_line_bytes else None
+
+
+@router.post(
+    "/new/batch",
+    tags=["API"],
+    name="Create Markdown Documents in Bulk",
+    response_class=JSONResponse,
+)
+async def new_markdown_documents(request: Request, api_key=Depends(verify_api_key)):
+    """
+    Create many markdown documents from a newline-delimited JSON (NDJSON) body.
+    Requires a valid API key.
+
+    Each line is a JSON object with the same fields as /new (title, content).
+    The body is parsed as it streams in and documents are inserted in chunks
+    of BATCH_INSERT_SIZE. Every line gets a result with either an id or an error.
+    """
+    from .db import create_markdown_documents
+
+    results = []
+    pending: list[tuple[int, str, str]] = []
+
+    async def insert_pending():
+        items = [(title, content) for _, title, content in pending]
+        try:
+            created = await create_markdown_documents(items)
+        except Exception as e:
+            logger.error(f"Error inserting batch of {len(items)} documents: {e}")
+            created = [e] * len(items)
+        for (line_no, _, content), result in zip(pending, created):
+            if isinstance(result, Exception):
+                results.append({"line": line_no, "error": "Failed to create document"})
+            else:
+                document_size.observe(len(content), endpoint="new")
+                results.append({"line": line_no, "id": result})
+        pending.clear()
+
+    async for line_no, line in iter_ndjson_lines(request.stream(), BATCH_MAX_LINE_BYTES):
+        if line is None:
+            results.append({"line": line_no, "error": f"Line exceeds {BATCH_MAX_LINE_BYTES} bytes"})
+            continue
+        try:
+            item = json.loads(line)
+            if not isinstance(item, dict):
+                raise ValueError("Expected a JSON object")
+        except ValueError:
+            results.append({"line": line_no, "error": "Invalid JSON object"})
+            continue
+
+        pending.append((line_no, str(item.get("title", "Untitled")), str(item.get("content", ""))))
+        if len(pending) >= BATCH_INSERT_SIZE:
+            await insert_pending()
+    if pending:
+        await insert_pending()
+    results.sort(key=lambda result: result["line"])
+
+    created = sum("id" in result for result in results)
+    logger.info(f"Batch import from {request.client.host}: {created} created, {len(results) - created} failed")
+    return {"created": created, "failed": len(results) - created, "results": results}
+
+
+def encode_cursor(created_at: datetime.datetime, last_id) -> str:
+    """Encode the position after a listed document as an opaque cursor."""
+    raw = f"{created_at.isoformat()}|{last_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """Decode a cursor from encode_cursor into (created_at, _id).
+
+    Raises:
+        HTTPException: 400 if the cursor is malformed.
+    """
+    from beanie import PydanticObjectId
+
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        created_at, _, last_id = raw.partition("|")
+        return datetime.datetime.fromisoformat(created_at), PydanticObjectId(last_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.get(
+    "/documents",
+    tags=["API"],
+    name="List Markdown Documents",
+    response_class=JSONResponse,
+)
+async def list_documents(
+    limit: int = Query(50, ge=1, le=LIST_MAX_LIMIT),
+    cursor: str = None,
+    api_key=Depends(verify_api_key),
+):
+    """
+    List document metadata, newest first. Requires a valid API key.
+
+    Pages are fetched with keyset pagination: pass the next_cursor of one
+    page as cursor to get the next. next_cursor is null on the last page.
+    """
+    from .db import list_markdown_documents
+
+    after = decode_cursor(cursor) if cursor else None
+    # One extra document tells whether there is a next page
+    documents = await list_markdown_documents(limit=limit + 1, after=after)
+    next_cursor = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        next_cursor = encode_cursor(documents[-1].created_at, documents[-1].id)
+
+    return {
+        "documents": [
+            {
+                "id": document.doc_id,
+                "title": document.title,
+                "created_at": document.created_at.isoformat(),
+                "content_hash": document.content_hash,
+            }
+            for document in documents
+        ],
+        "next_cursor": next_cursor,
+    }
+
+
+@router.get(
+    "/cache/stats",
+    tags=["API"],
+    name="Render Cache Statistics",
+    response_class=JSONResponse,
+)
+async def render_cache_stats(api_key=Depends(verify_api_key)):
+    """
+    Report hit/miss/eviction counters for the in-memory caches.
+    Requires a valid API key.
+    """
+    from .cache import render_cache, page_cache, block_cache
+    from .auth import api_key_cache, api_key_negative_cache, user_cache
+
+    return {
+        "render": render_cache.stats(),
+        "page": page_cache.stats(),
+        "blocks": block_cache.stats(),
+        "api_keys": api_key_cache.stats(),
+        "api_keys_negative": api_key_negative_cache.stats(),
+        "users": user_cache.stats(),
+    }
+
+
+@router.get(
+    "/render/stats",
+    tags=["API"],
+    name="Render Executor Statistics",
+    response_class=JSONResponse,
+)
+async def render_executor_stats(api_key=Depends(verify_api_key)):
+    """
+    Report queue wait and render time metrics for the render worker pool.
+    Requires a valid API key.
+    """
+    from .executor import render_executor
+
+    return render_executor.stats()
@@ -0,0 +1,160 @@
+"""Fingerprinted, minified and precompressed static assets.
+
+Stylesheets and scripts in the static directory are minified, named after a
+hash of their content (styles.css -> styles.1a2b3c4d5e.css) and compressed
+once. A fingerprinted URL always refers to the same bytes, so it can be
+cached by browsers for good; templates link to assets through static_url().
+"""
+
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+from .compression import compress_variants
+from .etag import make_etag
+from .logging_config import get_logger
+
+try:
+    import rcssmin
+except ImportError:  # A dependency, but minify_css/minify_js work without it
+    rcssmin = None
+
+try:
+    import rjsmin
+except ImportError:  # A dependency, but minify_css/minify_js work without it
+    rjsmin = None
+
+logger = get_logger(__name__)
+
+# Cache-Control for fingerprinted asset URLs
+ASSET_CACHE_CONTROL = os.getenv("ASSET_CACHE_CONTROL", "public, max-age=31536000, immutable")
+MANIFEST_NAME = "manifest.json"
+ASSET_TYPES = {
+    ".css": "text/css; charset=utf-8",
+    ".js": "text/javascript; charset=utf-8",
+}
+
+# Strings and comments, so whitespace is only collapsed outside of strings
+_CSS_TOKEN_RE = re.compile(r'("(?:[^"\\\n]|\\.)*"|\'(?:[^\'\\\n]|\\.)*\')|(/\*.*?\*/)', re.S)
+_CSS_SPACE_RE = re.compile(r"\s+")
+_CSS_PUNCTUATION_RE = re.compile(r"\s*([{};,])\s*")
+
+
+def _minify_css_code(code: str) -> str:
+    code = _CSS_SPACE_RE.sub(" ", code)
+    return _CSS_PUNCTUATION_RE.sub(r"\1", code).replace(";}", "}")
+
+
+def minify_css(text: str) -> str:
+    """Minify a stylesheet, with rcssmin if installed.
+
+    The fallback removes comments (except /*! ... */ license comments) and
+    collapses whitespace, leaving strings untouched.
+    """
+    if rcssmin is not None:
+        return rcssmin.cssmin(text, keep_bang_comments=True)
+
+    parts, code, position = [], [], 0
+    for match in _CSS_TOKEN_RE.finditer(text):
+        code.append(text[position:match.start()])
+        string, comment = match.groups()
+        if string or comment.startswith("/*!"):
+            parts.append(_minify_css_code("".join(code)))
+            parts.append(match.group())
+            code = []
+        position = match.end()
+    code.append(text[position:])
+    parts.append(_minify_css_code("".join(code)))
+    return "".join(parts).strip()
+
+
+def minify_js(text: str) -> str:
+    """Minify a script with rjsmin (scripts are left as is if it is missing)."""
+    if rjsmin is not None:
+        return rjsmin.jsmin(text, keep_bang_comments=True)
+    return text
+
+
+MINIFIERS = {".css": minify_css, ".js": minify_js}
+
+
+class Asset:
+    """A built static asset: its fingerprinted path and compressed variants."""
+
+    def __init__(self, name: str, path: str, media_type: str, variants: dict[str, bytes]):
+        self.name = name
+        self.path = path
+        self.media_type = media_type
+        self.variants = variants
+        self.etag = make_etag(path)
+
+
+def fingerprinted_name(name: str, body: bytes) -> str:
+    """Insert a hash of body into a file name (styles.css -> styles.<hash>.css)."""
+    stem, suffix = os.path.splitext(name)
+    return f"{stem}.{hashlib.sha256(body).hexdigest()[:10]}{suffix}"
+
+
+def source_fingerprint(directory: str) -> str:
+    """Hash the asset sources and minifiers, without building the assets.
+
+    Changes whenever a built asset's fingerprinted name can change.
+    """
+    digest = hashlib.sha256(f"{rcssmin is not None}-{rjsmin is not None}".encode("utf-8"))
+    for source in sorted(Path(directory).iterdir()):
+        if source.suffix in ASSET_TYPES and source.is_file():
+            digest.update(source.name.encode("utf-8"))
+            digest.update(source.read_bytes())
+    return digest.hexdigest()[:12]
+
+
+def build_assets(directory: str, minify: bool = True) -> dict[str, Asset]:
+    """Build every stylesheet and script in a directory.
+
+    Returns:
+        dict[str, Asset]: Built assets keyed by their original file name.
+    """
+    assets = {}
+    original_size = built_size = 0
+    for source in sorted(Path(directory).iterdir()):
+        media_type = ASSET_TYPES.get(source.suffix)
+        if media_type is None or not source.is_file():
+            continue
+        text = source.read_text(encoding="utf-8")
+        if minify:
+            text = MINIFIERS[source.suffix](text)
+        body = text.encode("utf-8")
+        asset = Asset(source.name, fingerprinted_name(source.name, body), media_type, compress_variants(body, best=True))
+        assets[source.name] = asset
+        original_size += source.stat().st_size
+        built_size += len(body)
+    logger.info(f"Built {len(assets)} static assets ({original_size} bytes, {built_size} minified)")
+    return assets
+
+
+def asset_manifest(assets: dict[str, Asset]) -> dict[str, str]:
+    """Map original file names to fingerprinted ones."""
+    return {name: asset.path for name, asset in assets.items()}
+
+
+def write_assets(assets: dict[str, Asset], directory: str) -> list[str]:
+    """Write built assets, their .gz/.br siblings and manifest.json to a directory.
+
+    For serving the static files from a reverse proxy or CDN (e.g. nginx
+    gzip_static) instead of the application.
+
+    Returns:
+        list[str]: The file names written.
+    """
+    out = Path(directory)
+    out.mkdir(parents=True, exist_ok=True)
+    written = []
+    for asset in assets.values():
+        for encoding, body in asset.variants.items():
+            name = asset.path + {"identity": "", "gzip": ".gz", "br": ".br"}[encoding]
+            (out / name).write_bytes(body)
+            written.append(name)
+    (out / MANIFEST_NAME).write_text(json.dumps(asset_manifest(assets), indent=2) + "\n", encoding="utf-8")
+    written.append(MANIFEST_NAME)
+    return written
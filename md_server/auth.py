@@ -1,12 +1,15 @@
 """API Key Management and Authentication."""
 
 import os
-from fastapi import Header, Security, HTTPException, Depends
+import time
+from fastapi import Header, Security, HTTPException, Depends, Request
 from fastapi.security import APIKeyHeader
 from datetime import datetime
 import hashlib
 
-from .db import create_api_key, get_api_key, log_api_usage, APIKey
+from .db import create_api_key, get_api_key, delete_api_key, get_user, get_or_create_user, APIKey
+from .usage import usage_logger
+from .cache import TTLCache, MISSING
 from .models import User
 from .constants import API_KEY_HEADER, AUTHENTIK_ID_HEADER, AUTHENTIK_NAME_HEADER
 from .logging_config import get_logger
@@ -16,39 +19,108 @@ logger = get_logger(__name__)
 #* API Keys
 api_key_header = APIKeyHeader(name=API_KEY_HEADER, auto_error=False)
 
+# Verified key hashes are cached for API_KEY_CACHE_TTL seconds. Rejected ones
+# are kept for API_KEY_NEGATIVE_TTL seconds in a separate, smaller cache, so
+# new keys become usable quickly, repeated invalid keys don't reach the
+# database, and a flood of random keys can't evict the valid ones. Guessing
+# keys is limited per client instead (API_KEY_FAILURE_LIMIT).
+api_key_cache = TTLCache(
+    ttl=float(os.getenv("API_KEY_CACHE_TTL", "60")),
+    max_entries=int(os.getenv("API_KEY_CACHE_SIZE", "10000")),
+)
+api_key_negative_cache = TTLCache(
+    ttl=float(os.getenv("API_KEY_NEGATIVE_TTL", "5")),
+    max_entries=int(os.getenv("API_KEY_NEGATIVE_CACHE_SIZE", "1000")),
+)
+
+# Invalid keys each client may send per minute before getting 429 (0 for no limit)
+API_KEY_FAILURE_LIMIT = int(os.getenv("API_KEY_FAILURE_LIMIT", "20"))
+# Invalid keys sent per (client, minute)
+api_key_failures = TTLCache(ttl=60, max_entries=100000)
+
+def api_key_failures_exceeded(client: str) -> bool:
+    """Whether a client sent API_KEY_FAILURE_LIMIT invalid keys this minute."""
+    if API_KEY_FAILURE_LIMIT <= 0:
+        return False
+    failures = api_key_failures.get((client, int(time.time() // 60)))
+    return failures is not MISSING and failures >= API_KEY_FAILURE_LIMIT
+
+def record_api_key_failure(client: str):
+    """Count an invalid key against its client's limit for the current minute."""
+    if API_KEY_FAILURE_LIMIT <= 0:
+        return
+    key = (client, int(time.time() // 60))
+    failures = api_key_failures.get(key)
+    api_key_failures.put(key, 1 if failures is MISSING else failures + 1)
+
 def hash_api_key(key: str) -> str:
     """Hash the API key using SHA-256."""
     return hashlib.sha256(key.encode()).hexdigest()
 
-async def verify_api_key(api_key: str = Security(api_key_header), request_ip: str = None):
+async def verify_api_key(request: Request, api_key: str = Security(api_key_header), request_ip: str = None):
     """Verify the provided API key."""
     if not api_key:
         logger.warning("No API key provided")
         raise HTTPException(status_code=403, detail="API key required")
     
+    client = request.client.host if request.client else "unknown"
+    if api_key_failures_exceeded(client):
+        logger.warning(f"Too many invalid API keys from {client}")
+        raise HTTPException(status_code=429, detail="Too many invalid API keys, try again later", headers={"Retry-After": "60"})
+    
     hashed_key = hash_api_key(api_key)
-    api_key_record: APIKey | None = await get_api_key(hashed_key)
+    api_key_record: APIKey | None = api_key_cache.get(hashed_key)
+    if api_key_record is MISSING:
+        if api_key_negative_cache.get(hashed_key) is not MISSING:
+            api_key_record = None
+        else:
+            api_key_record = await get_api_key(hashed_key)
+            if api_key_record:
+                api_key_cache.put(hashed_key, api_key_record)
+            else:
+                api_key_negative_cache.put(hashed_key, True)
     
     if not api_key_record:
-        logger.warning(f"Invalid API key attempt from IP: {request_ip}")
+        logger.warning(f"Invalid API key attempt from IP: {client}")
+        record_api_key_failure(client)
         raise HTTPException(status_code=403, detail="Invalid API key")
     
-    # Log the API usage
-    await log_api_usage(api_key=hashed_key, endpoint=request_ip or "unknown", client_ip=request_ip)
+    # Log the API usage (written in the background, in batches)
+    usage_logger.record(api_key=hashed_key, endpoint=request_ip or "unknown", client_ip=request_ip)
     
     logger.info(f"API key verified for IP: {request_ip}")
     return api_key_record
 
+def invalidate_api_key(hashed_key: str):
+    """Drop a key hash from the verification caches (after it is created or deleted)."""
+    api_key_cache.invalidate(hashed_key)
+    api_key_negative_cache.invalidate(hashed_key)
+
 async def new_api_key(description: str = None) -> str:
     """Generate a new API key and store its hash in the database."""
     raw_key = os.urandom(24).hex()
     hashed_key = hash_api_key(raw_key)
     
     await create_api_key(hash=hashed_key, description=description)
+    invalidate_api_key(hashed_key)
     logger.info(f"New API key created: {description or 'No description'}")
     return raw_key  # Return the raw key to the user only once
 
+async def revoke_api_key(hashed_key: str) -> bool:
+    """Delete an API key by its hash."""
+    deleted = await delete_api_key(hashed_key)
+    invalidate_api_key(hashed_key)
+    return deleted
+
 #* Authentik Authentication
+# Users are cached by ID hash for USER_CACHE_TTL seconds, unknown users for
+# USER_NEGATIVE_TTL seconds (dashboard pages poll /dash/status).
+USER_NEGATIVE_TTL = float(os.getenv("USER_NEGATIVE_TTL", "5"))
+user_cache = TTLCache(
+    ttl=float(os.getenv("USER_CACHE_TTL", "30")),
+    max_entries=int(os.getenv("USER_CACHE_SIZE", "10000")),
+)
+
 user_id_header = APIKeyHeader(name=AUTHENTIK_ID_HEADER, auto_error=False)
 user_name_header = APIKeyHeader(name=AUTHENTIK_NAME_HEADER, auto_error=True)
 
@@ -75,16 +147,19 @@ async def _verify_user(user_id: str, user_name: str = None, create: bool = False
         raise HTTPException(status_code=403, detail="User authentication required")
     
     id_sha = hash_api_key(user_id)# Hash the user ID for privacy
-    user: User | None = await User.find_one(User.uid_sha256 == id_sha)
+    user: User | None = user_cache.get(id_sha)
     
-    if not user and create:
-        # Create a new user record if not found and creation is allowed
-        user = User(uid_sha256=id_sha, name=user_name)
-        await user.save()
-        logger.info(f"New user created with ID hash: {id_sha}")
-    elif not user:
+    if user is MISSING or (not user and create):
+        if create:
+            # Get or create the user record in one atomic upsert
+            user = await get_or_create_user(id_sha, user_name)
+        else:
+            user = await get_user(id_sha)
+        user_cache.put(id_sha, user, ttl=None if user else USER_NEGATIVE_TTL)
+
+    if not user:
         logger.warning(f"User with ID hash {id_sha} not found and creation not allowed")
         raise HTTPException(status_code=403, detail="User not recognized")
 
-    logger.info(f"User authenticated: {user_id}")
+    logger.debug(f"User authenticated: {id_sha}")
     return user
\ No newline at end of file
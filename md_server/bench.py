@@ -0,0 +1,426 @@
+"""Render benchmarks for the markdown pipeline.
+
+The suite (run_suite) drives render_markdown and render_md_page over
+HOME_PAGE and generated corpora, and reports per-stage times, throughput and
+peak memory. Results can be saved as JSON and compared across commits:
+
+    md-server bench --output before.json
+    md-server bench --compare before.json
+"""
+
+import asyncio
+import datetime
+import json
+import logging
+import platform
+import random
+import subprocess
+import time
+import tracemalloc
+from pathlib import Path
+from markdown_it.renderer import RendererHTML
+
+from .constants import HOME_PAGE
+from .md import (
+    get_markdown_it,
+    create_markdown_it,
+    enhance_admonitions,
+    clean_html,
+    MarkdownRenderer,
+    SanitizingRenderer,
+    render_markdown,
+    render_md_page,
+    HTML_SANITIZER,
+    RENDERER_VERSION,
+)
+from .metrics import render_stage_duration
+
+DEFAULT_SIZES = [1024, 64 * 1024, 1024 * 1024]
+
+# Elements per section for each corpus
+CORPUS_PRESETS = {
+    "prose": {},
+    "tables": {"tables": 2},
+    "admonitions": {"admonitions": 2},
+    "code": {"code_blocks": 2},
+    "raw_html": {"raw_html": 2},
+    "mixed": {"tables": 1, "admonitions": 1, "code_blocks": 1, "raw_html": 1},
+}
+
+
+def generate_corpus(
+    size: int,
+    tables: int = 0,
+    admonitions: int = 0,
+    code_blocks: int = 0,
+    raw_html: int = 0,
+    seed: int = 0,
+) -> str:
+    """Generate a markdown document of roughly `size` bytes.
+
+    The document is a series of sections, each with a heading, a paragraph
+    and the given number of tables, admonitions, code blocks and raw HTML
+    blocks. Output is deterministic for a given seed.
+
+    Args:
+        size (int): Target size in bytes.
+        tables (int): Tables per section.
+        admonitions (int): Admonitions per section.
+        code_blocks (int): Fenced code blocks per section.
+        raw_html (int): Raw HTML blocks (and inline tags) per section.
+        seed (int): Seed for the generated text.
+
+    Returns:
+        str: The markdown document.
+    """
+    rng = random.Random(seed)
+    words = ["markdown", "server", "render", "cache", "token", "block", "inline", "table", "value", "quick", "document"]
+    admonition_types = ["note", "warning", "tip", "danger", "info"]
+
+    def sentence() -> str:
+        return " ".join(rng.choice(words) for _ in range(rng.randint(6, 14))).capitalize() + "."
+
+    parts = []
+    total = 0
+    n = 0
+    while total < size:
+        section = [f"## Section {n}\n", f"{sentence()} Some **bold**, *italic* and `code` text. {sentence()}\n"]
+        for i in range(tables):
+            rows = "".join(f"| {rng.choice(words)} {i} | {rng.randint(0, 999)} | a & b |\n" for _ in range(5))
+            section.append(f"| Name | Value | Notes |\n|:-----|------:|-------|\n{rows}")
+        for _ in range(admonitions):
+            section.append(f"!!! {rng.choice(admonition_types)} {rng.choice(words).capitalize()}\n    {sentence()}\n    {sentence()}\n")
+        for _ in range(code_blocks):
+            section.append(f"```python\ndef f{n}(a, b):\n    if a < b and b > \"{rng.choice(words)}\":\n        return a & b\n```\n")
+        for _ in range(raw_html):
+            section.append(
+                f"<div class=\"note\" style=\"color: red\" onclick=\"x()\">\n<script>alert({n})</script>\n</div>\n\n"
+                f"Text with <span class=\"x\">inline</span> and <b>raw</b> tags.\n"
+            )
+        block = "\n".join(section) + "\n"
+        parts.append(block)
+        total += len(block.encode("utf-8"))
+        n += 1
+    return "".join(parts)
+
+
+def format_size(size: int) -> str:
+    """Format a byte count as a corpus label, e.g. 64KB or 10MB."""
+    if size >= 1024 * 1024 and size % (1024 * 1024) == 0:
+        return f"{size // (1024 * 1024)}MB"
+    if size >= 1024:
+        return f"{size // 1024}KB"
+    return f"{size}B"
+
+
+def time_call(func, *args, repeat: int = 5) -> float:
+    """Return the best wall time in seconds of `repeat` calls."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def compare_admonitions(sizes: list[int] = None, repeat: int = 5) -> list[dict]:
+    """Compare the token-level admonition renderer with the legacy regex post-pass.
+
+    Documents are parsed once; only the render stage (plus the post-pass for
+    the legacy path) is timed, since parsing is identical for both.
+    """
+    md = get_markdown_it()
+    legacy = create_markdown_it(RendererHTML)
+
+    def render_token(tokens) -> str:
+        return md.renderer.render(tokens, md.options, {})
+
+    def render_legacy(tokens) -> str:
+        return enhance_admonitions(legacy.renderer.render(tokens, legacy.options, {}))
+
+    results = []
+    corpora = [("HOME_PAGE", HOME_PAGE)]
+    corpora += [
+        (format_size(size), generate_corpus(size, **CORPUS_PRESETS["admonitions"]))
+        for size in sizes or [64 * 1024, 1024 * 1024]
+    ]
+    for name, text in corpora:
+        tokens = md.parse(text)
+        legacy_tokens = legacy.parse(text)
+        results.append(
+            {
+                "corpus": name,
+                "bytes": len(text.encode("utf-8")),
+                "identical": render_token(tokens) == render_legacy(legacy_tokens),
+                "token_s": time_call(render_token, tokens, repeat=repeat),
+                "regex_s": time_call(render_legacy, legacy_tokens, repeat=repeat),
+            }
+        )
+    return results
+
+
+def compare_sanitizers(sizes: list[int] = None, repeat: int = 5) -> list[dict]:
+    """Compare the render-time sanitizer with rendering followed by the bleach pass.
+
+    `identical` is a differential check of the two outputs; known divergences
+    are code blocks containing entities or a malformed info string, where
+    bleach's re-parse and the render-time escaping disagree.
+    """
+    plain = create_markdown_it(MarkdownRenderer)
+    sanitizing = create_markdown_it(SanitizingRenderer)
+
+    def render_bleach(tokens) -> str:
+        return clean_html(plain.renderer.render(tokens, plain.options, {}))
+
+    def render_sanitizing(tokens) -> str:
+        return sanitizing.renderer.render(tokens, sanitizing.options, {})
+
+    results = []
+    corpora = [("HOME_PAGE", HOME_PAGE)]
+    corpora += [
+        (format_size(size), generate_corpus(size, **CORPUS_PRESETS["mixed"]))
+        for size in sizes or [64 * 1024, 1024 * 1024]
+    ]
+    for name, text in corpora:
+        plain_tokens = plain.parse(text)
+        sanitizing_tokens = sanitizing.parse(text)
+        results.append(
+            {
+                "corpus": name,
+                "bytes": len(text.encode("utf-8")),
+                "identical": render_bleach(plain_tokens) == render_sanitizing(sanitizing_tokens),
+                "bleach_s": time_call(render_bleach, plain_tokens, repeat=repeat),
+                "renderer_s": time_call(render_sanitizing, sanitizing_tokens, repeat=repeat),
+            }
+        )
+    return results
+
+
+def compare_middleware(requests: int = 2000, concurrency: int = 50) -> list[dict]:
+    """Compare per-request overhead of the ASGI middleware with BaseHTTPMiddleware equivalents.
+
+    Each stack wraps a trivial endpoint and is driven in-process (no network)
+    with `concurrency` concurrent clients. Logging is disabled while timing.
+    """
+    import httpx
+    from starlette.applications import Starlette
+    from starlette.middleware import Middleware
+    from starlette.middleware.base import BaseHTTPMiddleware
+    from starlette.responses import PlainTextResponse
+    from starlette.routing import Route
+    from .middleware import RequestLoggingMiddleware, NoCacheMiddleware
+
+    class BaseHTTPLogging(BaseHTTPMiddleware):
+        """Equivalent of RequestLoggingMiddleware on BaseHTTPMiddleware (the previous implementation)."""
+
+        async def dispatch(self, request, call_next):
+            start_time = time.time()
+            response = await call_next(request)
+            response.headers["X-Process-Time"] = str(time.time() - start_time)
+            return response
+
+    class BaseHTTPNoCache(BaseHTTPMiddleware):
+        """Equivalent of NoCacheMiddleware on BaseHTTPMiddleware (the previous implementation)."""
+
+        async def dispatch(self, request, call_next):
+            response = await call_next(request)
+            if request.url.path.startswith("/static/"):
+                response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
+            return response
+
+    async def endpoint(request):
+        return PlainTextResponse("ok")
+
+    stacks = {
+        "none": [],
+        "basehttp": [Middleware(BaseHTTPLogging), Middleware(BaseHTTPNoCache)],
+        "asgi": [Middleware(RequestLoggingMiddleware), Middleware(NoCacheMiddleware)],
+    }
+
+    async def drive(app) -> float:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def one():
+                async with semaphore:
+                    await client.get("/static/x")
+
+            start = time.perf_counter()
+            await asyncio.gather(*(one() for _ in range(requests)))
+            return time.perf_counter() - start
+
+    results = []
+    logging.disable(logging.INFO)
+    try:
+        for name, middleware in stacks.items():
+            app = Starlette(routes=[Route("/static/x", endpoint)], middleware=middleware)
+            elapsed = asyncio.run(drive(app))
+            results.append({"stack": name, "requests": requests, "total_s": elapsed, "per_request_us": elapsed / requests * 1e6})
+    finally:
+        logging.disable(logging.NOTSET)
+    return results
+
+
+def stage_totals() -> dict[str, tuple[int, float]]:
+    """Return (count, total seconds) per render stage from the stage histogram."""
+    return {key[0]: value for key, value in render_stage_duration.totals().items()}
+
+
+def bench_document(name: str, text: str, repeat: int = 5) -> dict:
+    """Benchmark rendering one document through render_markdown and render_md_page.
+
+    Stage times are the mean per call, taken from the same stage timers that
+    feed /metrics, so they cover exactly what the server runs. Peak memory is
+    measured in a separate, untimed render.
+    """
+    size = len(text.encode("utf-8"))
+    render_markdown(text)  # Warm up
+
+    markdown_s = time_call(render_markdown, text, repeat=repeat)
+
+    before = stage_totals()
+    page_s = time_call(render_md_page, text, repeat=repeat)
+    after = stage_totals()
+    stages = {}
+    for stage, (count, total) in after.items():
+        count -= before.get(stage, (0, 0.0))[0]
+        total -= before.get(stage, (0, 0.0))[1]
+        if count:
+            stages[stage] = total / repeat
+
+    tracemalloc.start()
+    try:
+        render_md_page(text)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "corpus": name,
+        "bytes": size,
+        "render_markdown_s": markdown_s,
+        "render_md_page_s": page_s,
+        "stages_s": stages,
+        "throughput_mb_s": size / page_s / 1e6 if page_s else 0.0,
+        "peak_memory_bytes": peak,
+    }
+
+
+def git_revision() -> str | None:
+    """Return the current git commit, if running from a checkout."""
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=Path(__file__).parent,
+            timeout=5,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def run_suite(
+    sizes: list[int] = None,
+    corpora: list[str] = None,
+    repeat: int = 5,
+    include_home: bool = True,
+) -> dict:
+    """Run the render benchmark suite.
+
+    Args:
+        sizes (list[int]): Generated corpus sizes in bytes.
+        corpora (list[str]): Corpus presets to run (see CORPUS_PRESETS); all by default.
+        repeat (int): Timed runs per document; the best run is reported.
+        include_home (bool): Also benchmark HOME_PAGE.
+
+    Returns:
+        dict: Run metadata and one result per document.
+    """
+    documents = [("HOME_PAGE", HOME_PAGE)] if include_home else []
+    for preset in corpora or list(CORPUS_PRESETS):
+        for size in sizes or DEFAULT_SIZES:
+            documents.append((f"{preset}-{format_size(size)}", generate_corpus(size, **CORPUS_PRESETS[preset])))
+
+    # One-off startup work (parser, static assets) shouldn't count towards the first document
+    from .static import get_assets
+
+    get_markdown_it()
+    get_assets()
+
+    results = []
+    logging.disable(logging.INFO)
+    try:
+        for name, text in documents:
+            results.append(bench_document(name, text, repeat=repeat))
+    finally:
+        logging.disable(logging.NOTSET)
+
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "revision": git_revision(),
+        "renderer_version": RENDERER_VERSION,
+        "html_sanitizer": HTML_SANITIZER,
+        "python": platform.python_version(),
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def compare_runs(baseline: dict, current: dict) -> list[dict]:
+    """Compare two suite runs by corpus; ratios below 1 mean the current run is faster."""
+    previous = {row["corpus"]: row for row in baseline["results"]}
+    rows = []
+    for row in current["results"]:
+        old = previous.get(row["corpus"])
+        if old is None:
+            continue
+        rows.append(
+            {
+                "corpus": row["corpus"],
+                "time_ratio": row["render_md_page_s"] / old["render_md_page_s"] if old["render_md_page_s"] else 0.0,
+                "memory_ratio": row["peak_memory_bytes"] / old["peak_memory_bytes"] if old["peak_memory_bytes"] else 0.0,
+            }
+        )
+    return rows
+
+
+def format_suite(run: dict) -> list[str]:
+    """Format suite results as a text table."""
+    stages = sorted({stage for row in run["results"] for stage in row["stages_s"]})
+    header = f"{'corpus':>18} {'bytes':>10} {'page ms':>9} {'MB/s':>7} {'peak MB':>8} " + " ".join(f"{stage[:10]:>10}" for stage in stages)
+    lines = [f"renderer {run['renderer_version']} at {run['revision'] or 'unknown revision'}", header]
+    for row in run["results"]:
+        stage_ms = " ".join(f"{row['stages_s'].get(stage, 0.0) * 1000:10.2f}" for stage in stages)
+        lines.append(
+            f"{row['corpus']:>18} {row['bytes']:>10} {row['render_md_page_s'] * 1000:9.2f} "
+            f"{row['throughput_mb_s']:7.2f} {row['peak_memory_bytes'] / 1e6:8.2f} {stage_ms}"
+        )
+    return lines
+
+
+def save_run(run: dict, path: str):
+    """Write suite results as JSON."""
+    Path(path).write_text(json.dumps(run, indent=2))
+
+
+def load_run(path: str) -> dict:
+    """Read suite results saved with save_run."""
+    return json.loads(Path(path).read_text())
+
+
+if __name__ == "__main__":
+    for row in compare_admonitions():
+        print(
+            f"{row['corpus']:>10} {row['bytes']:>9}B  token {row['token_s'] * 1000:8.2f}ms  "
+            f"regex {row['regex_s'] * 1000:8.2f}ms  identical={row['identical']}"
+        )
+    for row in compare_sanitizers():
+        print(
+            f"{row['corpus']:>10} {row['bytes']:>9}B  renderer {row['renderer_s'] * 1000:8.2f}ms  "
+            f"bleach {row['bleach_s'] * 1000:8.2f}ms  identical={row['identical']}"
+        )
+    for row in compare_middleware():
+        print(f"{row['stack']:>10} {row['requests']:>6} requests  {row['per_request_us']:8.1f}us/request")
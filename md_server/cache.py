@@ -0,0 +1,212 @@
+"""In-process caches for rendered markdown output."""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024  # 64MB
+
+
+def content_hash(content: str) -> str:
+    """Hash markdown content using SHA-256."""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def snippet_hash(content: str, title: str) -> str:
+    """Content address of a render snippet, covering its title and markdown."""
+    return hashlib.sha256(f"{title}\0{content}".encode("utf-8")).hexdigest()
+
+
+class RenderCache:
+    """LRU cache of rendered output bounded by a byte budget.
+
+    Entries are keyed by (document ID, content hash, version), so a document is
+    only ever served output rendered from its exact content by the current
+    renderer. Values are HTML strings, or any value with an explicit size.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[tuple[str, str, str], tuple[Any, int]] = OrderedDict()
+        self._keys_by_doc: dict[str, set[tuple[str, str, str]]] = {}
+        self._lock = threading.Lock()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get(self, md_id: str, digest: str, version: str) -> Any | None:
+        """Return the cached value for a document, or None on a miss."""
+        key = (md_id, digest, version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, md_id: str, digest: str, version: str, value: Any, size: int = None):
+        """Store a rendered value, evicting least recently used entries as needed.
+
+        The size defaults to the UTF-8 length of value, which must then be a str.
+        """
+        if not self.enabled:
+            return
+        if size is None:
+            size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            logger.debug(f"Rendered output for {md_id} exceeds cache budget ({size} bytes)")
+            return
+
+        key = (md_id, digest, version)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size)
+            self._keys_by_doc.setdefault(md_id, set()).add(key)
+            self.size_bytes += size
+
+            while self.size_bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, md_id: str):
+        """Drop every cached rendering of a document."""
+        with self._lock:
+            for key in list(self._keys_by_doc.get(md_id, ())):
+                self._remove(key)
+
+    def clear(self):
+        """Drop all cached entries (counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_doc.clear()
+            self.size_bytes = 0
+
+    def stats(self) -> dict:
+        """Return cache counters and current usage."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "size_bytes": self.size_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _remove(self, key: tuple[str, str, str]):
+        """Remove an entry; the caller must hold the lock."""
+        _, size = self._entries.pop(key)
+        self.size_bytes -= size
+        doc_keys = self._keys_by_doc.get(key[0])
+        if doc_keys is not None:
+            doc_keys.discard(key)
+            if not doc_keys:
+                del self._keys_by_doc[key[0]]
+
+
+# Sentinel for TTLCache misses, since None can be a cached value
+MISSING = object()
+
+
+class TTLCache:
+    """Small LRU cache whose entries expire after a time-to-live.
+
+    Entries can be given their own TTL, e.g. a shorter one for negative
+    (not found) results.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[Any, tuple[Any, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def get(self, key: Any) -> Any:
+        """Return the cached value, or MISSING if absent or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Any, value: Any, ttl: float = None):
+        """Cache a value, evicting the least recently used entry when full."""
+        ttl = self.ttl if ttl is None else ttl
+        if not self.enabled or ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Any):
+        """Drop a cached entry."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Drop all cached entries."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Return cache counters and current usage."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+# Rendered HTML fragments
+render_cache = RenderCache(
+    max_bytes=int(os.getenv("RENDER_CACHE_MAX_BYTES", str(DEFAULT_MAX_BYTES)))
+)
+
+# Complete response bodies with their precompressed variants
+page_cache = RenderCache(
+    max_bytes=int(os.getenv("PAGE_CACHE_MAX_BYTES", str(DEFAULT_MAX_BYTES)))
+)
+
+# Rendered top-level blocks for incremental editor previews
+block_cache = RenderCache(
+    max_bytes=int(os.getenv("BLOCK_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+)
+
+# Hashes of render snippets known to be stored, to skip repeated upserts
+snippet_cache = TTLCache(
+    ttl=float(os.getenv("SNIPPET_CACHE_TTL", "3600")),
+    max_entries=int(os.getenv("SNIPPET_CACHE_SIZE", "100000")),
+)
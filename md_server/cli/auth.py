@@ -1,9 +1,11 @@
 """CLI for managing API keys."""
 import typer
 import asyncio
+import glob
+import re
 from functools import wraps
-from ..db import list_api_keys, init_db as db_init, create_markdown_document
-from ..auth import new_api_key
+from pathlib import Path
+from typing import List
 from ..logging_config import get_logger
 
 logger = get_logger(__name__)
@@ -13,11 +15,21 @@ def async_command(func):
     """Decorator to handle async operations in CLI commands."""
     @wraps(func)
     def wrapper(*args, **kwargs):
-        return asyncio.run(func(*args, **kwargs))
+        async def run():
+            from ..db import close_db
+
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                await close_db()
+        return asyncio.run(run())
     return wrapper
 
 async def init_db():
     """Initialize the database connection."""
+    # The server modules are imported by commands that need them, so the CLI starts quickly
+    from ..db import init_db as db_init
+
     try:
         await db_init()
         logger.info("Database initialized successfully")
@@ -29,6 +41,8 @@ async def init_db():
 @async_command
 async def new(description: str = typer.Argument(..., help="Description for the new API key")):
     """Create a new API key."""
+    from ..auth import new_api_key
+
     await init_db()
     
     try:
@@ -44,6 +58,8 @@ async def new(description: str = typer.Argument(..., help="Description for the n
 @async_command
 async def list():
     """List all API keys."""    
+    from ..db import list_api_keys
+
     await init_db()
     
     try:
@@ -57,6 +73,27 @@ async def list():
         logger.error(f"Error listing API keys: {e}")
         typer.echo("Failed to list API keys", err=True)
         raise typer.Exit(code=1)
+
+@cli.command()
+@async_command
+async def delete(key_hash: str = typer.Argument(..., help="SHA256 hash of the API key (as shown by 'list')")):
+    """Delete an API key."""
+    from ..auth import revoke_api_key, api_key_cache
+
+    await init_db()
+
+    try:
+        if not await revoke_api_key(key_hash):
+            typer.echo("No API key found with that hash.", err=True)
+            raise typer.Exit(code=1)
+        typer.echo("API key deleted.")
+        typer.echo(f"Running servers may keep accepting it for up to {api_key_cache.ttl:g}s (API_KEY_CACHE_TTL).")
+    except typer.Exit:
+        raise
+    except Exception as e:
+        logger.error(f"Error deleting API key: {e}")
+        typer.echo("Failed to delete API key", err=True)
+        raise typer.Exit(code=1)
     
 @cli.command()
 @async_command
@@ -65,6 +102,8 @@ async def new_doc(
     fp: str = typer.Argument(..., help="File containing the markdown content"),
 ):
     """[Experimental] Create a new markdown document to insert into the database."""
+    from ..db import create_markdown_document
+
     await init_db()
     
     try:
@@ -81,4 +120,97 @@ async def new_doc(
     except Exception as e:
         logger.error(f"Error creating new document: {e}")
         typer.echo("Failed to create new document", err=True)
-        raise typer.Exit(code=1)
\ No newline at end of file
+        raise typer.Exit(code=1)
+
+TITLE_RE = re.compile(r"^#\s+(.+?)\s*#*\s*$", re.MULTILINE)
+
+
+def find_markdown_files(paths: List[str], pattern: str) -> List[Path]:
+    """Expand files, directories (searched recursively for pattern) and glob patterns."""
+    files = []
+    for path in paths:
+        matches = [Path(match) for match in glob.glob(path, recursive=True)] or [Path(path)]
+        for match in matches:
+            if match.is_dir():
+                files.extend(sorted(match.rglob(pattern)))
+            elif match.is_file():
+                files.append(match)
+    return files
+
+
+def read_markdown_file(path: Path) -> tuple[str, str]:
+    """Read a markdown file as (title, content); the title is the first H1, or the file name."""
+    content = path.read_text(encoding="utf-8")
+    match = TITLE_RE.search(content)
+    return (match.group(1) if match else path.stem), content
+
+
+@cli.command("import")
+@async_command
+async def import_docs(
+    paths: List[str] = typer.Argument(..., help="Markdown files, directories or glob patterns (quote globs)"),
+    pattern: str = typer.Option("*.md", help="File pattern used when searching directories"),
+    batch_size: int = typer.Option(500, help="Documents per insert"),
+    concurrency: int = typer.Option(4, help="Batches read and inserted at the same time"),
+):
+    """Import markdown files into the database in batches."""
+    from ..db import create_markdown_documents
+
+    files = find_markdown_files(paths, pattern)
+    if not files:
+        typer.echo("No markdown files found.", err=True)
+        raise typer.Exit(code=1)
+    await init_db()
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    created = failed = 0
+
+    async def import_batch(batch: List[Path]):
+        nonlocal created, failed
+        async with semaphore:
+            items = []
+            for path in batch:
+                try:
+                    items.append(await asyncio.to_thread(read_markdown_file, path))
+                except Exception as e:
+                    logger.error(f"Error reading file '{path}': {e}")
+                    typer.echo(f"Failed to read file: {path}", err=True)
+                    failed += 1
+            if not items:
+                return
+            try:
+                results = await create_markdown_documents(items)
+            except Exception as e:
+                logger.error(f"Error importing batch of {len(items)} documents: {e}")
+                results = [e] * len(items)
+            for result in results:
+                if isinstance(result, Exception):
+                    failed += 1
+                else:
+                    created += 1
+            typer.echo(f"Imported {created}/{len(files)} documents")
+
+    await asyncio.gather(
+        *(import_batch(files[i:i + batch_size]) for i in range(0, len(files), batch_size))
+    )
+    typer.echo(f"Created {created} documents, {failed} failed")
+    if failed:
+        raise typer.Exit(code=1)
+
+@cli.command()
+@async_command
+async def rerender(
+    force: bool = typer.Option(False, "--force", help="Re-render all documents, even if up to date"),
+):
+    """Re-render stored document HTML after a renderer version bump."""
+    from ..db import rerender_documents
+
+    await init_db()
+
+    try:
+        count = await rerender_documents(force=force)
+        typer.echo(f"Re-rendered {count} documents")
+    except Exception as e:
+        logger.error(f"Error re-rendering documents: {e}")
+        typer.echo("Failed to re-render documents", err=True)
+        raise typer.Exit(code=1)
@@ -33,6 +33,11 @@ def run(
     log_level: str = typer.Option(
         os.getenv("LOG_LEVEL", "info").lower(), 
         help="Log level (debug, info, warning, error)"
+    ),
+    startup_profile: bool = typer.Option(
+        False,
+        "--startup-profile",
+        help="Log how long imports and initialization take at startup"
     )
 ):
     """Start the markdown server."""
@@ -41,6 +46,14 @@ def run(
     logger.info(f"Log level: {log_level}")
     
     try:
+        if startup_profile:
+            from ..startup import STARTUP_PROFILE_ENV, profile_imports
+
+            os.environ[STARTUP_PROFILE_ENV] = "true"
+            if not reload:
+                # With reload, the app is imported in a worker process instead
+                profile_imports()
+
         import uvicorn
         uvicorn.run(
             "md_server.main:app", 
@@ -52,6 +65,65 @@ def run(
     except Exception as e:
         logger.error(f"Failed to start server: {e}")
         raise typer.Exit(code=1)
-    
+
+
+@cli.command()
+def bench(
+    sizes: str = typer.Option(
+        "1024,65536,1048576",
+        help="Comma-separated corpus sizes in bytes (1KB to 10MB is a sensible range)"
+    ),
+    corpora: str = typer.Option(
+        None,
+        help="Comma-separated corpus presets (prose, tables, admonitions, code, raw_html, mixed); all by default"
+    ),
+    repeat: int = typer.Option(5, help="Timed runs per document; the best run is reported"),
+    output: str = typer.Option(None, help="Write results as JSON to this file"),
+    compare: str = typer.Option(None, help="Compare with results from a previous run (JSON file)"),
+):
+    """Benchmark markdown rendering over HOME_PAGE and generated corpora."""
+    from ..bench import CORPUS_PRESETS, run_suite, format_suite, compare_runs, save_run, load_run
+
+    presets = [name.strip() for name in corpora.split(",")] if corpora else None
+    unknown = [name for name in presets or [] if name not in CORPUS_PRESETS]
+    if unknown:
+        typer.echo(f"Unknown corpus presets: {', '.join(unknown)}", err=True)
+        raise typer.Exit(code=1)
+
+    run = run_suite(
+        sizes=[int(size) for size in sizes.split(",")],
+        corpora=presets,
+        repeat=repeat,
+    )
+    for line in format_suite(run):
+        typer.echo(line)
+
+    if compare:
+        baseline = load_run(compare)
+        typer.echo(f"Compared with {baseline.get('revision') or compare} (ratio < 1 is faster/smaller):")
+        for row in compare_runs(baseline, run):
+            typer.echo(f"{row['corpus']:>18}  time x{row['time_ratio']:.2f}  memory x{row['memory_ratio']:.2f}")
+    if output:
+        save_run(run, output)
+        typer.echo(f"Results written to {output}")
+
+
+
+@cli.command("build-assets")
+def build_assets_command(
+    output: str = typer.Argument(..., help="Directory to write the built assets and manifest.json to"),
+    minify: bool = typer.Option(True, help="Minify stylesheets and scripts"),
+):
+    """Build fingerprinted, minified and precompressed static assets for a reverse proxy or CDN.
+
+    The server builds the same assets in memory at startup, so this is only
+    needed to serve /static/ without the application.
+    """
+    from ..assets import build_assets, write_assets
+    from ..static import STATIC_DIR
+
+    written = write_assets(build_assets(STATIC_DIR, minify=minify), output)
+    typer.echo(f"Wrote {len(written)} files to {output}")
+
 if __name__ == "__main__":
     cli()
\ No newline at end of file
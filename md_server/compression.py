@@ -0,0 +1,101 @@
+"""Precompressed response variants and Accept-Encoding negotiation."""
+
+import gzip
+import os
+from starlette.responses import Response
+from .etag import encoding_etag
+from .metrics import render_stage_duration
+
+try:
+    import brotli
+except ImportError:  # A dependency, but gzip alone works without it
+    brotli = None
+
+# Bodies smaller than this are not worth compressing
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+
+# Levels for bodies compressed while serving requests (pages, raw documents).
+# Brotli's maximum (11) is far slower for little gain, so it is only used for
+# static assets, which are compressed once.
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+
+# Server preference when the client accepts several encodings equally
+PREFERRED_ENCODINGS = ["br", "gzip", "identity"]
+
+
+def compress_variants(body: bytes, best: bool = False) -> dict[str, bytes]:
+    """Compress a response body once into every supported encoding.
+
+    Args:
+        body (bytes): The uncompressed body.
+        best (bool): Use the maximum compression levels instead of GZIP_LEVEL
+            and BROTLI_QUALITY, for bodies compressed once ahead of time.
+
+    Returns:
+        dict[str, bytes]: Bodies keyed by content coding, always including "identity".
+    """
+    variants = {"identity": body}
+    if len(body) < COMPRESSION_MIN_SIZE:
+        return variants
+
+    with render_stage_duration.time(stage="compress"):
+        variants["gzip"] = gzip.compress(body, compresslevel=9 if best else GZIP_LEVEL, mtime=0)
+        if brotli is not None:
+            variants["br"] = brotli.compress(body, mode=brotli.MODE_TEXT, quality=11 if best else BROTLI_QUALITY)
+    return variants
+
+
+def negotiate_encoding(accept_encoding: str | None, available: dict[str, bytes]) -> str:
+    """Pick the best available content coding for an Accept-Encoding header."""
+    if not accept_encoding:
+        return "identity"
+
+    qualities = {}
+    for part in accept_encoding.split(","):
+        coding, *params = part.split(";")
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        coding = coding.strip().lower()
+        if coding:
+            qualities[coding] = quality
+
+    wildcard = qualities.get("*", 0.0)
+    best, best_quality = "identity", 0.0
+    for coding in PREFERRED_ENCODINGS:
+        if coding not in available:
+            continue
+        quality = qualities.get(coding, wildcard)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def encoded_response(
+    variants: dict[str, bytes],
+    accept_encoding: str | None,
+    media_type: str,
+    headers: dict[str, str] = None,
+) -> Response:
+    """Build a response from precompressed variants for the client's Accept-Encoding.
+
+    An ETag in headers is made specific to the chosen encoding (see encoding_etag).
+    """
+    encoding = negotiate_encoding(accept_encoding, variants)
+    response_headers = {"Vary": "Accept-Encoding", **(headers or {})}
+    if encoding != "identity":
+        response_headers["Content-Encoding"] = encoding
+        if "ETag" in response_headers:
+            response_headers["ETag"] = encoding_etag(response_headers["ETag"], encoding)
+    return Response(content=variants[encoding], media_type=media_type, headers=response_headers)
+
+
+def variants_size(variants: dict[str, bytes]) -> int:
+    """Total size in bytes of all variants."""
+    return sum(len(body) for body in variants.values())
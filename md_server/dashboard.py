@@ -21,11 +21,9 @@ router = APIRouter()
     "/", tags=["UI", "Dashboard"], name="Dashboard", response_class=HTMLResponse
 )
 async def read_home(request: Request, user: User = Depends(verify_user_auto)):
-    """[Debug] Read out request headers and client info."""
-    logger.info(f"Home page requested from {request.client.host}")
+    """Dashboard home page for the authenticated user."""
+    logger.debug(f"Dashboard requested from {request.client.host}")
     try:
-        for header, value in request.headers.items():
-            logger.info(f"Header: {header} = {value}")
         return templates.TemplateResponse(
             "dashboard.html",
             {
@@ -54,7 +52,7 @@ async def auth_status(user: User = Depends(verify_user)):
             detail="Not authenticated",
         )
     
-    logger.info(f"Authenticated user {user.id} accessed /status")
+    logger.debug(f"Authenticated user {user.id} accessed /status")
     return {
         "authenticated": True,
         "user_id": str(user.id),
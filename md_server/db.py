@@ -1,9 +1,19 @@
 """Database module for the markdown server."""
 
+import datetime
+import functools
 import os
-from beanie import init_beanie
-from motor.motor_asyncio import AsyncIOMotorClient
-from .models import MarkdownDocument, APIKey, APIUsageLog, User
+import zlib
+from typing import AsyncIterator
+from beanie import init_beanie, PydanticObjectId
+from pymongo import DESCENDING, ReadPreference, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from beanie.odm.utils.parsing import parse_obj
+from beanie.odm.utils.projection import get_projection
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase, AsyncIOMotorGridFSBucket
+from .models import MarkdownDocument, MarkdownDocumentMeta, APIKey, APIUsageLog, User, RenderSnippet
+from .cache import render_cache, page_cache, content_hash
+from .metrics import timed_db_operation
 from .logging_config import get_logger
 
 logger = get_logger(__name__)
@@ -17,13 +27,102 @@ def get_connection_string() -> str:
     return connection_string
 
 
+#* Storage Backend
+# "mongodb" (default) or "sqlite" for single-node deployments without MongoDB
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "mongodb").lower()
+SQLITE_PATH = os.getenv("SQLITE_PATH", "md_server.db")
+SQLITE_READ_WORKERS = int(os.getenv("SQLITE_READ_WORKERS", "4"))
+
+_storage = None  # SQLiteStorage when STORAGE_BACKEND is "sqlite", set up by init_db()
+
+
+def storage_operation(func):
+    """Route a storage function to the configured backend.
+
+    The decorated functions in this module are the storage interface, and
+    their bodies are the MongoDB implementation. With STORAGE_BACKEND=sqlite,
+    calls go to the SQLiteStorage method of the same name instead.
+    """
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        if _storage is not None:
+            return await getattr(_storage, func.__name__)(*args, **kwargs)
+        return await func(*args, **kwargs)
+
+    return wrapper
+
+
+async def init_storage():
+    """Open the SQLite backend, if configured."""
+    global _storage
+    if _storage is None:
+        from .sqlite_db import SQLiteStorage
+
+        _storage = SQLiteStorage(
+            SQLITE_PATH,
+            read_workers=SQLITE_READ_WORKERS,
+            snippet_ttl_days=int(os.getenv("SNIPPET_TTL_DAYS", "30")),
+        )
+        await _storage.init()
+
+
+#* Client
+# Pool and timeout options for the shared client; options left unset keep
+# the driver defaults (or those given in MONGO_URL)
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "10000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "10000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "0"))
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "")
+# Serve document reads (/d, /raw) from secondaries when available
+MONGO_READ_SECONDARY = os.getenv("MONGO_READ_SECONDARY", "false").lower() == "true"
+
+_client: AsyncIOMotorClient | None = None
+
+
+def client_options() -> dict:
+    """Keyword arguments for the shared MongoDB client."""
+    options = {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": MONGO_MAX_IDLE_TIME_MS or None,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS or None,
+    }
+    if MONGO_COMPRESSORS:
+        options["compressors"] = MONGO_COMPRESSORS
+    return options
+
+
+def get_client() -> AsyncIOMotorClient:
+    """Return the shared MongoDB client, creating it on first use.
+
+    The client is bound to the event loop it is first used on; close_db()
+    must be called before using the database from another loop.
+    """
+    global _client
+    if _client is None:
+        options = client_options()
+        logger.info(f"Creating MongoDB client (pool size {options['minPoolSize']}-{options['maxPoolSize']})")
+        _client = AsyncIOMotorClient(get_connection_string(), **options)
+    return _client
+
+
 async def init_db():
     """Initialize the database connection and Beanie ODM."""
+    if STORAGE_BACKEND == "sqlite":
+        await init_storage()
+        return
+
     connection_str = get_connection_string()
     logger.info(f"Connecting to MongoDB at: {connection_str}")
     
     try:
-        client = AsyncIOMotorClient(connection_str)
+        client = get_client()
         
         # Test the connection
         await client.admin.command('ping')
@@ -33,53 +132,422 @@ async def init_db():
         logger.info(f"Using database: {database.name}")
         
         await init_beanie(
-            database=database, document_models=[MarkdownDocument, APIKey, APIUsageLog, User]
+            database=database, document_models=[MarkdownDocument, APIKey, APIUsageLog, User, RenderSnippet]
         )
         logger.info("Beanie initialization completed successfully")
         
     except Exception as e:
         logger.error(f"Database initialization failed: {e}")
         raise
+
+
+async def close_db():
+    """Close the shared MongoDB client and its connection pool (or the SQLite backend)."""
+    global _client, _storage
+    if _storage is not None:
+        _storage.close()
+        _storage = None
+    if _client is not None:
+        logger.info("Closing MongoDB client")
+        _client.close()
+        _client = None
+
     
 async def get_db():
     """Get the database connection."""
-    connection_str = get_connection_string()
-    client = AsyncIOMotorClient(connection_str)
-    return client.get_default_database()
+    return get_client().get_default_database()
+
+
+async def find_document_on_secondary(md_id: str, projection_model=None):
+    """Find a document by ID with secondaryPreferred reads.
+
+    Falls back to the primary if the document is not found, since a
+    secondary may not have replicated a newly created document yet.
+    """
+    model = projection_model or MarkdownDocument
+    collection = MarkdownDocument.get_pymongo_collection().with_options(
+        read_preference=ReadPreference.SECONDARY_PREFERRED
+    )
+    raw = await collection.find_one({"doc_id": md_id}, projection=get_projection(model))
+    if raw is not None:
+        return parse_obj(model, raw)
+    logger.debug(f"Document {md_id} not found on secondary, retrying on primary")
+    query = MarkdownDocument.find_one(MarkdownDocument.doc_id == md_id)
+    return await (query.project(projection_model) if projection_model else query)
+
+#* Content Storage
+# Content at least this large (UTF-8 bytes) is stored zlib-compressed; 0 disables
+CONTENT_COMPRESS_MIN_SIZE = int(os.getenv("CONTENT_COMPRESS_MIN_SIZE", "16384"))
+# Content at least this large is stored in GridFS instead of the document; 0 disables
+CONTENT_GRIDFS_MIN_SIZE = int(os.getenv("CONTENT_GRIDFS_MIN_SIZE", str(4 * 1024 * 1024)))
+CONTENT_BUCKET = "md_server.content"
+CONTENT_READ_SIZE = 255 * 1024  # GridFS default chunk size
+
+def content_bucket():
+    """GridFS bucket for document content stored out of line."""
+    database = MarkdownDocument.get_pymongo_collection().database
+    if isinstance(database, AsyncIOMotorDatabase):
+        return AsyncIOMotorGridFSBucket(database, bucket_name=CONTENT_BUCKET)
+    from gridfs import AsyncGridFSBucket
+
+    return AsyncGridFSBucket(database, bucket_name=CONTENT_BUCKET)
+
+async def pack_text(data: bytes, filename: str, metadata: dict) -> tuple[str | None, bytes | None, PydanticObjectId | None]:
+    """Pick where a large text value is stored: inline, zlib-compressed or in GridFS.
+
+    Returns:
+        tuple: (storage, compressed, file_id), where storage is None (inline),
+            "zlib" (compressed holds the value) or "gridfs" (file_id does).
+    """
+    if CONTENT_GRIDFS_MIN_SIZE and len(data) >= CONTENT_GRIDFS_MIN_SIZE:
+        file_id = await content_bucket().upload_from_stream(filename, data, metadata=metadata)
+        return "gridfs", None, file_id
+    if CONTENT_COMPRESS_MIN_SIZE and len(data) >= CONTENT_COMPRESS_MIN_SIZE:
+        return "zlib", zlib.compress(data), None
+    return None, None, None
+
+async def unpack_text(storage: str, compressed: bytes | None, file_id: PydanticObjectId | None) -> str:
+    """Read a text value stored by pack_text."""
+    if storage == "zlib":
+        return zlib.decompress(compressed).decode("utf-8")
+    stream = await content_bucket().open_download_stream(file_id)
+    return (await stream.read()).decode("utf-8")
+
+async def store_content(document: MarkdownDocument) -> str:
+    """Move a new document's content and rendered HTML to compressed or GridFS storage if large.
+
+    Clears document.content and document.rendered_html when they are stored
+    elsewhere, and returns the original content, which the caller restores
+    (with the rendered HTML) once the document is written. If the write
+    fails, the caller removes any GridFS files with delete_content.
+    """
+    content = document.content
+    if not CONTENT_COMPRESS_MIN_SIZE and not CONTENT_GRIDFS_MIN_SIZE:
+        return content
+    if document.rendered_html is not None:
+        document.rendered_storage, document.rendered_compressed, document.rendered_file_id = await pack_text(
+            document.rendered_html.encode("utf-8"), f"{document.doc_id}.html", {"doc_id": document.doc_id, "rendered": True}
+        )
+        if document.rendered_storage is not None:
+            document.rendered_html = None
+    data = content.encode("utf-8")
+    document.content_storage, document.content_compressed, document.content_file_id = await pack_text(
+        data, document.doc_id, {"doc_id": document.doc_id}
+    )
+    if document.content_storage is not None:
+        document.content_size = len(data)
+        document.content = ""
+    return content
+
+async def load_content(document: MarkdownDocument) -> MarkdownDocument:
+    """Fill in document.content and rendered_html for values not stored inline."""
+    if document.content_storage is not None:
+        document.content = await unpack_text(
+            document.content_storage, document.content_compressed, document.content_file_id
+        )
+    if document.rendered_storage is not None:
+        document.rendered_html = await unpack_text(
+            document.rendered_storage, document.rendered_compressed, document.rendered_file_id
+        )
+    return document
+
+async def iter_content(document: MarkdownDocument) -> AsyncIterator[bytes]:
+    """Yield a document's UTF-8 content in chunks, without loading all of it for GridFS content."""
+    if document.content_storage == "gridfs":
+        stream = await content_bucket().open_download_stream(document.content_file_id)
+        while chunk := await stream.readchunk():
+            yield chunk
+    elif document.content_storage == "zlib":
+        decompressor = zlib.decompressobj()
+        data = document.content_compressed
+        for i in range(0, len(data), CONTENT_READ_SIZE):
+            yield decompressor.decompress(data[i:i + CONTENT_READ_SIZE])
+        yield decompressor.flush()
+    else:
+        yield document.content.encode("utf-8")
+
+async def delete_content(document: MarkdownDocument):
+    """Delete content and rendered HTML stored out of line for a document."""
+    if document.content_storage == "gridfs" and document.content_file_id:
+        await content_bucket().delete(document.content_file_id)
+    if document.rendered_storage == "gridfs" and document.rendered_file_id:
+        await content_bucket().delete(document.rendered_file_id)
 
 #* Document Operations
-async def get_markdown_document(md_id: str) -> MarkdownDocument | None:
-    """Retrieve a markdown document by its ID."""
+@timed_db_operation
+@storage_operation
+async def get_markdown_document(md_id: str, load: bool = True, secondary_ok: bool = False) -> MarkdownDocument | None:
+    """Retrieve a markdown document by its ID.
+
+    Content stored compressed or in GridFS is loaded into document.content,
+    unless load is False (e.g. to stream it with iter_content instead).
+    With secondary_ok, the read may go to a secondary if MONGO_READ_SECONDARY is set.
+    """
     logger.info(f"Fetching markdown document with ID: {md_id}")
-    document = await MarkdownDocument.find_one(MarkdownDocument.doc_id == md_id)
+    if secondary_ok and MONGO_READ_SECONDARY:
+        document = await find_document_on_secondary(md_id)
+    else:
+        document = await MarkdownDocument.find_one(MarkdownDocument.doc_id == md_id)
     if document:
         logger.info(f"Document found: {document.title}")
+        if load:
+            await load_content(document)
     else:
         logger.warning(f"No document found with ID: {md_id}")
     return document
 
-async def create_markdown_document(title: str, content: str) -> MarkdownDocument:
-    """Create a new markdown document."""
+@timed_db_operation
+@storage_operation
+async def get_markdown_document_meta(md_id: str, secondary_ok: bool = False) -> MarkdownDocumentMeta | None:
+    """Retrieve a markdown document's metadata by its ID, without its content."""
+    logger.debug(f"Fetching markdown document metadata with ID: {md_id}")
+    if secondary_ok and MONGO_READ_SECONDARY:
+        return await find_document_on_secondary(md_id, MarkdownDocumentMeta)
+    return await MarkdownDocument.find_one(MarkdownDocument.doc_id == md_id).project(MarkdownDocumentMeta)
+
+@timed_db_operation
+@storage_operation
+async def list_markdown_documents(
+    limit: int = 50, after: tuple[datetime.datetime, PydanticObjectId] = None
+) -> list[MarkdownDocumentMeta]:
+    """List document metadata, newest first, using keyset pagination.
+
+    Args:
+        limit (int): Maximum number of documents to return.
+        after (tuple[datetime, PydanticObjectId]): (created_at, _id) of the
+            last document of the previous page, or None for the first page.
+
+    Returns:
+        list[MarkdownDocumentMeta]: The page of documents.
+    """
+    query = {}
+    if after is not None:
+        created_at, last_id = after
+        # Seeks on the (created_at, _id) index instead of skipping documents
+        query = {
+            "$or": [
+                {"created_at": {"$lt": created_at}},
+                {"created_at": created_at, "_id": {"$lt": last_id}},
+            ]
+        }
+    return await (
+        MarkdownDocument.find(query)
+        .sort([("created_at", DESCENDING), ("_id", DESCENDING)])
+        .limit(limit)
+        .project(MarkdownDocumentMeta)
+        .to_list()
+    )
+
+def render_on_save_enabled() -> bool:
+    """Whether rendered HTML should be persisted alongside document content."""
+    return os.getenv("RENDER_ON_SAVE", "false").lower() == "true"
+
+@timed_db_operation
+@storage_operation
+async def create_markdown_document(title: str, content: str, render: bool = None) -> MarkdownDocument:
+    """Create a new markdown document.
+
+    If render is True (defaults to RENDER_ON_SAVE), the content is rendered
+    once and the HTML is stored with the document.
+    """
     logger.info(f"Creating new markdown document: {title}")
-    document = MarkdownDocument(title=title, content=content)
-    await document.save()
+    if render is None:
+        render = render_on_save_enabled()
+
+    document = MarkdownDocument(title=title, content=content, content_hash=content_hash(content))
+    if render:
+        from .md import render_stored_html, RENDERER_VERSION
+
+        document.rendered_html = await render_stored_html(content)
+        if document.rendered_html is not None:
+            document.renderer_version = RENDERER_VERSION
+    rendered_html = document.rendered_html
+    await store_content(document)
+    try:
+        await document.save()
+    except Exception:
+        await delete_content(document)  # Don't leave orphaned GridFS files behind
+        raise
+    finally:
+        document.content, document.rendered_html = content, rendered_html
     logger.info(f"Document created with ID: {document.doc_id}")
     return document
 
+@timed_db_operation
+@storage_operation
+async def create_markdown_documents(items: list[tuple[str, str]], render: bool = None) -> list[str | Exception]:
+    """Create several markdown documents with a single insert_many.
+
+    The insert is unordered, so one failing document does not stop the rest.
+
+    Args:
+        items (list[tuple[str, str]]): (title, content) pairs.
+        render (bool): Render and store HTML (defaults to RENDER_ON_SAVE).
+
+    Returns:
+        list[str | Exception]: The new document ID, or the error, for each item in order.
+    """
+    from pymongo.errors import BulkWriteError
+
+    logger.info(f"Creating {len(items)} markdown documents")
+    if render is None:
+        render = render_on_save_enabled()
+
+    documents = [
+        MarkdownDocument(title=title, content=content, content_hash=content_hash(content))
+        for title, content in items
+    ]
+    if render:
+        from .md import render_stored_html, RENDERER_VERSION
+
+        for document in documents:
+            document.rendered_html = await render_stored_html(document.content)
+            if document.rendered_html is not None:
+                document.renderer_version = RENDERER_VERSION
+
+    results: list[str | Exception] = [document.doc_id for document in documents]
+    for document in documents:
+        await store_content(document)  # Content isn't returned, so it needn't be restored
+    try:
+        await MarkdownDocument.insert_many(documents, ordered=False)
+    except BulkWriteError as e:
+        for error in e.details.get("writeErrors", []):
+            results[error["index"]] = RuntimeError(error.get("errmsg", "Write failed"))
+            await delete_content(documents[error["index"]])
+        logger.warning(f"{len(e.details.get('writeErrors', []))} of {len(items)} documents failed to insert")
+    logger.info(f"Inserted {sum(isinstance(result, str) for result in results)} documents")
+    return results
+
+@timed_db_operation
+@storage_operation
 async def delete_markdown_document(md_id: str) -> bool:
     """Delete a markdown document by its ID."""
     logger.info(f"Deleting markdown document with ID: {md_id}")
-    document = await get_markdown_document(md_id)
+    document = await get_markdown_document(md_id, load=False)
     if document:
         await document.delete()
+        await delete_content(document)
+        render_cache.invalidate(md_id)
+        page_cache.invalidate(md_id)
         logger.info(f"Document with ID: {md_id} deleted successfully")
         return True
     else:
         logger.warning(f"Cannot delete, no document found with ID: {md_id}")
         return False
+
+@timed_db_operation
+@storage_operation
+async def store_rendered_html(document: MarkdownDocument, html: str, version: str):
+    """Persist rendered HTML for a document without touching its content.
+
+    Large HTML is stored compressed or in GridFS, like content; a GridFS file
+    holding the previous HTML is deleted once it is replaced.
+    """
+    logger.debug(f"Storing rendered HTML for document: {document.doc_id} (renderer {version})")
+    storage, compressed, file_id = await pack_text(
+        html.encode("utf-8"), f"{document.doc_id}.html", {"doc_id": document.doc_id, "rendered": True}
+    )
+    previous_file_id = document.rendered_file_id if document.rendered_storage == "gridfs" else None
+    updates = {
+        MarkdownDocument.rendered_html: None if storage else html,
+        MarkdownDocument.rendered_storage: storage,
+        MarkdownDocument.rendered_compressed: compressed,
+        MarkdownDocument.rendered_file_id: file_id,
+        MarkdownDocument.renderer_version: version,
+    }
+    if not document.content_hash:
+        updates[MarkdownDocument.content_hash] = content_hash(document.content)
+    try:
+        await document.set(updates)
+    except Exception:
+        if file_id is not None:
+            await content_bucket().delete(file_id)
+        raise
+    document.rendered_html = html
+    if previous_file_id is not None:
+        await content_bucket().delete(previous_file_id)
+
+@storage_operation
+async def rerender_documents(force: bool = False) -> int:
+    """Re-render stored documents whose HTML is missing or from an older renderer.
+
+    Args:
+        force (bool): Re-render every document, even if already up to date.
+
+    Documents that fail to render are skipped (and logged).
+
+    Returns:
+        int: The number of documents re-rendered.
+    """
+    from .md import render_stored_html, RENDERER_VERSION
+
+    logger.info(f"Re-rendering documents for renderer version {RENDERER_VERSION}")
+    if force:
+        query = MarkdownDocument.find_all()
+    else:
+        query = MarkdownDocument.find(MarkdownDocument.renderer_version != RENDERER_VERSION)
+
+    count = 0
+    async for document in query:
+        await load_content(document)
+        html = await render_stored_html(document.content)
+        if html is None:
+            logger.warning(f"Skipping document {document.doc_id}, which failed to render")
+            continue
+        await store_rendered_html(document, html, RENDERER_VERSION)
+        render_cache.invalidate(document.doc_id)
+        page_cache.invalidate(document.doc_id)
+        count += 1
+    logger.info(f"Re-rendered {count} documents")
+    return count
+    
+    
+#* Render Snippet Operations
+@timed_db_operation
+@storage_operation
+async def store_snippet(hash: str, title: str, content: str):
+    """Store a render snippet by its hash, or mark an existing one as used."""
+    logger.debug(f"Storing render snippet: {hash}")
+    now = datetime.datetime.now(datetime.timezone.utc)
+    await RenderSnippet.get_pymongo_collection().update_one(
+        {"hash": hash},
+        {
+            "$setOnInsert": {"hash": hash, "title": title, "content": content},
+            "$set": {"last_used": now},
+        },
+        upsert=True,
+    )
+
+@timed_db_operation
+@storage_operation
+async def get_snippet(hash: str) -> RenderSnippet | None:
+    """Retrieve a render snippet by its hash."""
+    logger.debug(f"Fetching render snippet: {hash}")
+    return await RenderSnippet.find_one(RenderSnippet.hash == hash)
+
+@timed_db_operation
+@storage_operation
+async def touch_snippet(hash: str) -> bool:
+    """Mark a render snippet as used, returning whether it exists."""
+    logger.debug(f"Touching render snippet: {hash}")
+    collection = RenderSnippet.get_pymongo_collection()
+    # Look up first, so requests for unknown hashes don't cause writes
+    if await collection.find_one({"hash": hash}, projection={"_id": 1}) is None:
+        return False
+    now = datetime.datetime.now(datetime.timezone.utc)
+    result = await collection.update_one({"hash": hash}, {"$set": {"last_used": now}})
+    return result.matched_count > 0
+
+@timed_db_operation
+@storage_operation
+async def count_snippets() -> int:
+    """Count stored render snippets (estimated from collection metadata)."""
+    return await RenderSnippet.get_pymongo_collection().estimated_document_count()
     
     
 #* API Key Operations
+@timed_db_operation
+@storage_operation
 async def create_api_key(hash: str, description: str = None) -> APIKey:
     """Create a new API key."""
     logger.info(f"Creating new API key: {description or 'No description'}")
@@ -87,6 +555,8 @@ async def create_api_key(hash: str, description: str = None) -> APIKey:
     await api_key.save()
     logger.info(f"API key created with ID: {api_key.id}")
     return api_key
+@timed_db_operation
+@storage_operation
 async def get_api_key(hash: str) -> APIKey | None:
     """Retrieve an API key by its hash."""
     logger.info(f"Fetching API key with hash: {hash}")
@@ -96,6 +566,19 @@ async def get_api_key(hash: str) -> APIKey | None:
     else:
         logger.warning(f"No API key found with hash: {hash}")
     return api_key
+@timed_db_operation
+@storage_operation
+async def delete_api_key(hash: str) -> bool:
+    """Delete an API key by its hash."""
+    logger.info(f"Deleting API key with hash: {hash}")
+    api_key = await APIKey.find_one(APIKey.hash == hash)
+    if api_key:
+        await api_key.delete()
+        return True
+    logger.warning(f"Cannot delete, no API key found with hash: {hash}")
+    return False
+@timed_db_operation
+@storage_operation
 async def list_api_keys() -> list[APIKey]:
     """List all API keys."""
     logger.info("Listing all API keys")
@@ -103,9 +586,54 @@ async def list_api_keys() -> list[APIKey]:
     logger.info(f"Total API keys found: {len(api_keys)}")
     return api_keys
 
+@timed_db_operation
+@storage_operation
 async def log_api_usage(api_key: str, endpoint: str, client_ip: str = None):
     """Log an API usage event."""
     logger.info(f"Logging API usage for key: {api_key} at endpoint: {endpoint}")
     usage_log = APIUsageLog(api_key=api_key, endpoint=endpoint, client_ip=client_ip)
     await usage_log.save()
-    logger.info("API usage logged successfully")
\ No newline at end of file
+    logger.info("API usage logged successfully")
+
+@timed_db_operation
+@storage_operation
+async def log_api_usage_batch(events: list[dict]):
+    """Insert a batch of API usage events (APIUsageLog fields) in a single write."""
+    if not events:
+        return
+    logger.debug(f"Writing batch of {len(events)} API usage events")
+    await APIUsageLog.insert_many([APIUsageLog(**event) for event in events])
+
+
+#* User Operations
+@timed_db_operation
+@storage_operation
+async def get_user(uid_sha256: str) -> User | None:
+    """Retrieve a user by their hashed Authentik ID."""
+    logger.debug(f"Fetching user with ID hash: {uid_sha256}")
+    return await User.find_one(User.uid_sha256 == uid_sha256)
+
+@timed_db_operation
+@storage_operation
+async def get_or_create_user(uid_sha256: str, name: str = None) -> User:
+    """Retrieve a user by their hashed Authentik ID, creating them if needed.
+
+    Done in a single atomic upsert, so concurrent first requests create one user.
+    """
+    logger.debug(f"Fetching or creating user with ID hash: {uid_sha256}")
+    fields = {
+        "uid_sha256": uid_sha256,
+        "created_at": datetime.datetime.now(datetime.timezone.utc),
+        "name": name,
+    }
+    try:
+        raw = await User.get_pymongo_collection().find_one_and_update(
+            {"uid_sha256": uid_sha256},
+            {"$setOnInsert": fields},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        # Lost an upsert race on the unique index; the other request created the user
+        return await User.find_one(User.uid_sha256 == uid_sha256)
+    return parse_obj(User, raw)
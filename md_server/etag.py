@@ -0,0 +1,68 @@
+"""ETag and conditional request helpers."""
+
+import os
+from starlette.responses import Response
+
+# Cache-Control sent with document responses. Documents are immutable but can
+# be deleted, so clients revalidate (cheaply, via If-None-Match) by default.
+DOCUMENT_CACHE_CONTROL = os.getenv("DOCUMENT_CACHE_CONTROL", "public, no-cache")
+# Cache-Control sent with /r/{hash} pages. The markdown behind a hash never
+# changes, only its rendering (after renderer or template updates) can.
+SNIPPET_CACHE_CONTROL = os.getenv("SNIPPET_CACHE_CONTROL", "public, max-age=86400")
+
+
+def make_etag(*parts: str) -> str:
+    """Build a strong ETag from its parts."""
+    return '"' + "-".join(parts) + '"'
+
+
+# Content codings whose responses get their own ETag (see encoding_etag)
+ETAG_ENCODINGS = ("br", "gzip")
+
+
+def encoding_etag(etag: str, encoding: str) -> str:
+    """ETag of a compressed representation ("abc" -> "abc-br").
+
+    Each encoding is a different representation with different bytes, so it
+    needs its own strong ETag (for range requests and shared caches).
+    """
+    if encoding == "identity":
+        return etag
+    return etag[:-1] + "-" + encoding + '"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> str | None:
+    """Check an If-None-Match header against an ETag (weak comparison).
+
+    ETags of the compressed representations (see encoding_etag) match too.
+
+    Returns:
+        str | None: The matching ETag, to send back with the 304 response,
+            or None if nothing matches.
+    """
+    if not if_none_match:
+        return None
+    if if_none_match.strip() == "*":
+        return etag
+    accepted = {etag, *(encoding_etag(etag, encoding) for encoding in ETAG_ENCODINGS)}
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate in accepted:
+            return candidate
+    return None
+
+
+def cache_headers(etag: str, cache_control: str = DOCUMENT_CACHE_CONTROL) -> dict[str, str]:
+    """Headers to attach to a cacheable document response."""
+    return {"ETag": etag, "Cache-Control": cache_control}
+
+
+def not_modified(etag: str, cache_control: str = DOCUMENT_CACHE_CONTROL) -> Response:
+    """Build a 304 Not Modified response for an ETag.
+
+    Sends the same Vary header as encoded_response, since the ETag depends on
+    the negotiated encoding.
+    """
+    return Response(status_code=304, headers={"Vary": "Accept-Encoding", **cache_headers(etag, cache_control)})
@@ -0,0 +1,211 @@
+"""Worker pool for CPU-bound markdown rendering."""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from collections.abc import Iterator
+from typing import Any, Callable
+from .logging_config import get_logger, setup_worker_logging
+
+logger = get_logger(__name__)
+
+
+def _timed_call(func: Callable[[Any], Any], data: Any) -> tuple[Any, float, float]:
+    """Run func in a worker and report when it started and finished.
+
+    Wall clock time is used so timestamps are comparable across processes.
+    """
+    started = time.time()
+    result = func(data)
+    return result, started, time.time()
+
+
+class RenderExecutor:
+    """Runs render functions off the event loop with bounded queueing and timeouts.
+
+    Small inputs (below inline_threshold bytes) are rendered inline, since the
+    hand-off costs more than the render itself.
+    """
+
+    def __init__(
+        self,
+        mode: str = "thread",
+        workers: int = None,
+        inline_threshold: int = 65536,
+        max_queue: int = 32,
+        timeout: float = 30.0,
+    ):
+        self.mode = mode
+        self.workers = workers or os.cpu_count() or 1
+        self.inline_threshold = inline_threshold
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor: Executor | None = None
+        self.pending = 0
+        # Jobs finish in worker threads, so pending is updated under a lock
+        self._pending_lock = threading.Lock()
+
+        # Metrics
+        self.inline_renders = 0
+        self.offloaded_renders = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.render_time_total = 0.0
+        self.render_time_max = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode in ("thread", "process")
+
+    def _get_executor(self) -> Executor:
+        """Create the worker pool on first use."""
+        if self._executor is None:
+            logger.info(f"Starting {self.mode} render pool with {self.workers} workers")
+            if self.mode == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=setup_worker_logging)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="render")
+        return self._executor
+
+    async def run(self, func: Callable[[Any], Any], data: str | bytes) -> Any:
+        """Run func(data), in the worker pool if data is large enough.
+
+        Used for rendering markdown and for compressing rendered pages.
+
+        Raises:
+            HTTPException: 503 if the render queue is full, 504 if the render times out.
+        """
+        if not self.enabled or len(data) < self.inline_threshold:
+            self.inline_renders += 1
+            return func(data)
+
+        # Imported here, so render worker processes don't import FastAPI
+        from fastapi import HTTPException
+
+        if self.pending >= self.max_queue:
+            self.rejected += 1
+            logger.warning(f"Render queue full ({self.pending} pending), rejecting render")
+            raise HTTPException(status_code=503, detail="Render queue is full, try again later")
+
+        submitted = time.time()
+        job = self._get_executor().submit(_timed_call, func, data)
+        self._add_pending()
+        # Released when the job finishes, not when the request gives up on it,
+        # so jobs still running after a timeout keep counting towards max_queue
+        job.add_done_callback(lambda _: self._release_pending())
+        try:
+            result, started, finished = await asyncio.wait_for(asyncio.wrap_future(job), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            # The worker keeps running (unless it hadn't started), only the request gives up on it
+            self.timeouts += 1
+            logger.error(f"Render of {len(data)} bytes timed out after {self.timeout}s")
+            raise HTTPException(status_code=504, detail="Rendering timed out")
+
+        wait, render = max(0.0, started - submitted), finished - started
+        self.offloaded_renders += 1
+        self.queue_wait_total += wait
+        self.queue_wait_max = max(self.queue_wait_max, wait)
+        self.render_time_total += render
+        self.render_time_max = max(self.render_time_max, render)
+        logger.debug(f"Rendered {len(data)} bytes in pool (wait {wait:.3f}s, render {render:.3f}s)")
+        return result
+
+    def stream(self, chunks: Iterator[Any], size: int) -> Iterator[Any]:
+        """Count a render that is iterated outside the pool (a streamed page).
+
+        The chunks are produced by whoever iterates the result (StreamingResponse
+        does so in its own threadpool), but count towards max_queue while they
+        are, and stop with TimeoutError once producing them has taken longer
+        than timeout.
+
+        Raises:
+            HTTPException: 503 if the render queue is full.
+        """
+        if not self.enabled:
+            return chunks
+
+        from fastapi import HTTPException
+
+        if self.pending >= self.max_queue:
+            self.rejected += 1
+            logger.warning(f"Render queue full ({self.pending} pending), rejecting streamed render")
+            raise HTTPException(status_code=503, detail="Render queue is full, try again later")
+
+        # Counters other than pending are only updated on the event loop
+        loop = asyncio.get_running_loop()
+        self._add_pending()
+
+        def generate() -> Iterator[Any]:
+            end = object()
+            render, timed_out = 0.0, False
+            try:
+                while True:
+                    # Only time spent rendering counts, not waiting for the client
+                    started = time.time()
+                    chunk = next(chunks, end)
+                    render += time.time() - started
+                    if chunk is end:
+                        break
+                    if render > self.timeout:
+                        timed_out = True
+                        logger.error(f"Streamed render of {size} bytes timed out after {self.timeout}s")
+                        raise TimeoutError("Rendering timed out")
+                    yield chunk
+            finally:
+                loop.call_soon_threadsafe(self._stream_finished, render, timed_out)
+
+        return generate()
+
+    def _add_pending(self):
+        with self._pending_lock:
+            self.pending += 1
+
+    def _release_pending(self):
+        with self._pending_lock:
+            self.pending -= 1
+
+    def _stream_finished(self, render: float, timed_out: bool):
+        self._release_pending()
+        if timed_out:
+            self.timeouts += 1
+            return
+        self.offloaded_renders += 1
+        self.render_time_total += render
+        self.render_time_max = max(self.render_time_max, render)
+
+    def stats(self) -> dict:
+        """Return executor counters and timing metrics."""
+        offloaded = self.offloaded_renders
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "pending": self.pending,
+            "inline_renders": self.inline_renders,
+            "offloaded_renders": offloaded,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "queue_wait_avg": self.queue_wait_total / offloaded if offloaded else 0.0,
+            "queue_wait_max": self.queue_wait_max,
+            "render_time_avg": self.render_time_total / offloaded if offloaded else 0.0,
+            "render_time_max": self.render_time_max,
+        }
+
+    def shutdown(self):
+        """Shut down the worker pool, if it was started."""
+        if self._executor is not None:
+            logger.info("Shutting down render pool")
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+render_executor = RenderExecutor(
+    mode=os.getenv("RENDER_EXECUTOR", "thread").lower(),
+    workers=int(os.getenv("RENDER_WORKERS", "0")) or None,
+    inline_threshold=int(os.getenv("RENDER_INLINE_THRESHOLD", "65536")),
+    max_queue=int(os.getenv("RENDER_QUEUE_MAX", "32")),
+    timeout=float(os.getenv("RENDER_TIMEOUT", "30")),
+)
@@ -1,13 +1,137 @@
 """Logging configuration."""
 
+import atexit
 import logging
 import logging.config
+import logging.handlers
 import os
+import queue
+import threading
+import time
 from pathlib import Path
 
+# Loggers on the request path, whose INFO/DEBUG messages are rate limited
+DEFAULT_RATE_LIMITED_LOGGERS = ",".join(
+    [
+        "md_server.main",
+        "md_server.api",
+        "md_server.auth",
+        "md_server.db",
+        "md_server.models",
+        "md_server.md",
+        "md_server.middleware",
+        "uvicorn.access",
+    ]
+)
 
-def setup_logging():
-    """Configure logging for the application."""
+# Active queue listeners (when LOG_QUEUE is enabled)
+_listeners: list[logging.handlers.QueueListener] = []
+# Handlers moved behind a queue, by logger, to restore them in worker processes
+_queued_handlers: dict[logging.Logger, list[logging.Handler]] = {}
+# The rate limit filter of the current configuration
+_rate_limit: logging.Filter | None = None
+# Whether setup_logging() has run in this process
+_configured = False
+
+
+class RateLimitFilter(logging.Filter):
+    """Limit low-severity records to a number per second for each logger.
+
+    Records at WARNING and above always pass. When records have been
+    suppressed, the next record let through notes how many were dropped.
+    The decision is made once per record, so the filter can be added to
+    several handlers.
+    """
+
+    def __init__(self, rate: float = 0, loggers: str = ""):
+        super().__init__()
+        self.rate = rate
+        self.loggers = {name.strip() for name in loggers.split(",") if name.strip()}
+        self._windows: dict[str, list] = {}  # logger name -> [window start, count, suppressed]
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate <= 0 or record.levelno >= logging.WARNING or record.name not in self.loggers:
+            return True
+        passed = getattr(record, "rate_limit_passed", None)
+        if passed is None:
+            passed = record.rate_limit_passed = self._count(record)
+        return passed
+
+    def _count(self, record: logging.LogRecord) -> bool:
+        """Count a record against its logger's window, and decide whether it passes."""
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.setdefault(record.name, [now, 0, 0])
+            if now - window[0] >= 1.0:
+                window[0], window[1] = now, 0
+            if window[1] >= self.rate:
+                window[2] += 1
+                return False
+            window[1] += 1
+            suppressed, window[2] = window[2], 0
+
+        if suppressed:
+            record.msg = f"{record.getMessage()} ({suppressed} similar messages suppressed)"
+            record.args = None
+        return True
+
+
+def _configured_logger(name: str) -> logging.Logger:
+    """Get a logger by its name in the logging config ("root" for the root logger)."""
+    return logging.getLogger() if name == "root" else logging.getLogger(name)
+
+
+def _stop_listeners():
+    """Stop queue listeners, flushing any queued records."""
+    while _listeners:
+        _listeners.pop().stop()
+
+
+def _enable_queue(logger_names: list[str], log_filter: logging.Filter):
+    """Move the handlers of the given loggers behind queues served by listener threads.
+
+    Loggers sharing the same handlers share one queue and listener, so file
+    and console I/O happens off the calling (event loop) thread. The filter
+    runs before records are queued, so dropped records are never queued.
+    """
+    groups: dict[tuple, list[logging.Logger]] = {}
+    for name in logger_names:
+        logger = _configured_logger(name)
+        if logger.handlers:
+            groups.setdefault(tuple(logger.handlers), []).append(logger)
+
+    for handlers, loggers in groups.items():
+        log_queue = queue.SimpleQueue()
+        queue_handler = logging.handlers.QueueHandler(log_queue)
+        queue_handler.addFilter(log_filter)
+        listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        listener.start()
+        _listeners.append(listener)
+        for logger in loggers:
+            _queued_handlers[logger] = logger.handlers
+            logger.handlers = [queue_handler]
+
+
+def _add_filter(logger_names: list[str], log_filter: logging.Filter):
+    """Add a filter to the handlers of the given loggers."""
+    for name in logger_names:
+        for handler in _configured_logger(name).handlers:
+            handler.addFilter(log_filter)
+
+
+def setup_logging(force: bool = False, use_queue: bool = None):
+    """Configure logging for the application.
+
+    Runs once per process (the CLI and the app both call it); pass force to
+    reconfigure. use_queue overrides LOG_QUEUE.
+    """
+    global _configured, _rate_limit
+    if _configured and not force:
+        return
+    _configured = True
+    _stop_listeners()  # In case logging is being reconfigured
+    _queued_handlers.clear()
     
     # Create logs directory if it doesn't exist
     log_dir = Path("logs")
@@ -15,6 +139,14 @@ def setup_logging():
     
     # Get log level from environment variable, default to INFO
     log_level = os.getenv("LOG_LEVEL", "INFO").upper()
+
+    # Handlers run on background threads unless LOG_QUEUE=false
+    if use_queue is None:
+        use_queue = os.getenv("LOG_QUEUE", "true").lower() == "true"
+    _rate_limit = rate_limit = RateLimitFilter(
+        rate=float(os.getenv("LOG_RATE_LIMIT", "0")),
+        loggers=os.getenv("LOG_RATE_LIMITED_LOGGERS", DEFAULT_RATE_LIMITED_LOGGERS),
+    )
     
     # Logging configuration
     config = {
@@ -84,6 +216,34 @@ def setup_logging():
     
     logging.config.dictConfig(config)
 
+    logger_names = list(config["loggers"]) + ["root"]
+    if use_queue:
+        _enable_queue(logger_names, rate_limit)
+    else:
+        _add_filter(logger_names, rate_limit)
+
+
+def setup_worker_logging():
+    """Process pool initializer: write logs directly from the worker process.
+
+    Forked workers inherit the queue handlers, but not the listener threads
+    that empty the queues, so their records would never be written. The
+    original handlers are put back instead. Spawned workers start
+    unconfigured and are set up without queues.
+    """
+    if not _configured:
+        setup_logging(use_queue=False)
+        return
+    _listeners.clear()  # The listener threads only run in the parent process
+    for logger, handlers in _queued_handlers.items():
+        logger.handlers = handlers
+        for handler in handlers:
+            handler.addFilter(_rate_limit)
+    _queued_handlers.clear()
+
+
+atexit.register(_stop_listeners)
+
 
 def get_logger(name: str) -> logging.Logger:
     """Get a logger instance for the given name.
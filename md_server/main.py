@@ -1,18 +1,43 @@
 """Main application module and user-facing endpoints."""
 
+import asyncio
 import os
-from fastapi import FastAPI, Request, Response
-from fastapi.responses import HTMLResponse, PlainTextResponse
+import re
+import time
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import HTMLResponse, PlainTextResponse, StreamingResponse
 from dotenv import load_dotenv
 from contextlib import asynccontextmanager
 
-from .static import static_files
+from .static import static_files, get_assets
 from .templates import templates
 from .constants import APP_NAME, HOME_PAGE, APP_SOURCE
-from .md import render_md_page, render_markdown
+from .md import (
+    get_markdown_it,
+    render_md_page,
+    render_markdown_offloaded,
+    render_markdown_blocks,
+    render_cached_markdown,
+    render_html_page,
+    get_stored_html,
+    page_etag,
+    stream_md_page,
+    RENDERER_VERSION,
+    STREAM_MIN_SIZE,
+    RENDER_ERROR_HTML,
+    RenderError,
+)
+from .cache import content_hash, snippet_hash, page_cache, render_cache, block_cache, snippet_cache, TTLCache, MISSING
+from .compression import compress_variants, encoded_response, variants_size
+from .executor import render_executor
+from .usage import usage_logger
+from .etag import make_etag, etag_matches, cache_headers, not_modified, SNIPPET_CACHE_CONTROL
+from .metrics import CONTENT_TYPE, document_size, metrics_enabled, render_metrics, stats_collector
 from .logging_config import setup_logging, get_logger
+from .startup import startup_profile, log_startup_profile
 from .middleware import RequestLoggingMiddleware, NoCacheMiddleware
 from .api import router as api_router
+from .auth import api_key_cache, api_key_negative_cache, user_cache
 from .dashboard import router as dashboard_router
 
 
@@ -22,24 +47,47 @@ setup_logging()  # Configure logging
 logger = get_logger(__name__)
 
 
+async def init_database():
+    """Connect to the database (or open the SQLite backend)."""
+    from .db import init_db
+
+    with startup_profile.phase("init database"):
+        await init_db()
+
+
+def prepare_rendering():
+    """Build static assets and the markdown parser before the first request needs them."""
+    with startup_profile.phase("build static assets"):
+        get_assets()
+    with startup_profile.phase("create markdown parser"):
+        get_markdown_it()
+
+
 # Lifespan event to initialize database connection
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifespan context manager to handle startup and shutdown events."""
     logger.info("Application startup: initializing database")
     try:
-        from .db import init_db
-
-        await init_db()
+        # Rendering is prepared in a thread while the database connects
+        await asyncio.gather(init_database(), asyncio.to_thread(prepare_rendering))
         logger.info("Database initialization completed successfully")
     except Exception as e:
         logger.error(f"Failed to initialize database: {e}")
         raise
+    with startup_profile.phase("start usage logger"):
+        await usage_logger.start()
+    log_startup_profile()
 
     yield
 
     logger.info("Application shutdown: cleaning up resources")
-    # Any shutdown code can go here if needed
+    await usage_logger.stop()
+    render_executor.shutdown()
+
+    from .db import close_db
+
+    await close_db()
 
 
 # Initialize FastAPI application
@@ -56,6 +104,23 @@ if os.getenv("NO_CACHE", "false").lower() == "true":
 
 logger.info(f"Starting {APP_NAME} v0.1.0")
 
+# Expose cache, render pool and usage logger counters on /metrics
+CACHE_COUNTERS = ("hits", "misses", "evictions")
+stats_collector.register("cache", render_cache.stats, {"cache": "render"}, counters=CACHE_COUNTERS)
+stats_collector.register("cache", page_cache.stats, {"cache": "page"}, counters=CACHE_COUNTERS)
+stats_collector.register("cache", api_key_cache.stats, {"cache": "api_keys"}, counters=CACHE_COUNTERS)
+stats_collector.register(
+    "cache", api_key_negative_cache.stats, {"cache": "api_keys_negative"}, counters=CACHE_COUNTERS
+)
+stats_collector.register("cache", user_cache.stats, {"cache": "users"}, counters=CACHE_COUNTERS)
+stats_collector.register("cache", block_cache.stats, {"cache": "blocks"}, counters=CACHE_COUNTERS)
+stats_collector.register(
+    "render_pool",
+    render_executor.stats,
+    counters=("inline_renders", "offloaded_renders", "rejected", "timeouts"),
+)
+stats_collector.register("usage_log", usage_logger.stats, counters=("written", "dropped", "failed", "batches"))
+
 
 # User-facing endpoints
 @app.get("/", tags=["UI"], name="Home", response_class=HTMLResponse)
@@ -85,9 +150,26 @@ async def read_markdown(md_id: str, request: Request):
     logger.info(f"Markdown document requested: {md_id} from {request.client.host}")
 
     try:
-        from .db import get_markdown_document
+        from .db import (
+            get_markdown_document,
+            get_markdown_document_meta,
+            load_content,
+            render_on_save_enabled,
+            store_rendered_html,
+        )
 
-        document = await get_markdown_document(md_id)
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            # Revalidation only needs the content hash, not the content
+            meta = await get_markdown_document_meta(md_id, secondary_ok=True)
+            if meta and meta.content_hash:
+                etag = page_etag(meta.content_hash)
+                matched = etag_matches(if_none_match, etag)
+                if matched:
+                    return not_modified(matched)
+
+        # Content stored out of line is loaded below only on a page cache miss
+        document = await get_markdown_document(md_id, load=False, secondary_ok=True)
         if not document:
             logger.warning(f"Document not found: {md_id}")
             return templates.TemplateResponse(
@@ -101,12 +183,69 @@ async def read_markdown(md_id: str, request: Request):
                 status_code=404,
             )
 
-        return render_md_page(
-            document.content,
-            request=request,
-            title=document.title,
-            md_id=md_id,
+        if document.content_storage is None:
+            document_size.observe(len(document.content), endpoint="d")
+        else:
+            document_size.observe(document.content_size or 0, endpoint="d")
+        digest = document.content_hash or content_hash(document.content)
+        etag = page_etag(digest)
+        matched = etag_matches(if_none_match, etag)
+        if matched:
+            return not_modified(matched)
+
+        variants = page_cache.get(md_id, digest, etag)
+        if variants is None:
+            await load_content(document)
+            html_content = get_stored_html(document)
+            if html_content is None:
+                # Missing or rendered by an older renderer version, re-render lazily.
+                # Process pools render out of the server process, so don't stream there
+                if (
+                    STREAM_MIN_SIZE
+                    and render_executor.mode != "process"
+                    and len(document.content) >= STREAM_MIN_SIZE
+                ):
+                    html_content = render_cache.get(md_id, digest, RENDERER_VERSION)
+                    if html_content is None:
+                        # Send the page head now and the body as it renders
+                        # (cached once complete, so the next request gets a full page)
+                        return StreamingResponse(
+                            stream_md_page(
+                                document.content,
+                                request=request,
+                                title=document.title,
+                                md_id=md_id,
+                                digest=digest,
+                            ),
+                            media_type="text/html; charset=utf-8",
+                            headers=cache_headers(etag),
+                        )
+                else:
+                    html_content = await render_cached_markdown(
+                        md_id, document.content, digest=digest
+                    )
+                if render_on_save_enabled():
+                    await store_rendered_html(document, html_content, RENDERER_VERSION)
+
+            page = render_html_page(
+                html_content,
+                request=request,
+                title=document.title,
+                md_id=md_id,
+            )
+            # Compress once per page rather than once per request
+            variants = await render_executor.run(compress_variants, page.body)
+            page_cache.put(md_id, digest, etag, variants, size=variants_size(variants))
+
+        return encoded_response(
+            variants,
+            request.headers.get("accept-encoding"),
+            media_type="text/html; charset=utf-8",
+            headers=cache_headers(etag),
         )
+    except RenderError:
+        # Shown without an ETag and not cached, so the next request tries again
+        return render_html_page(RENDER_ERROR_HTML, request=request, title=document.title, md_id=md_id)
     except Exception as e:
         logger.error(f"Error rendering markdown document {md_id}: {e}")
         raise
@@ -118,21 +257,62 @@ async def read_markdown(md_id: str, request: Request):
     name="Raw Markdown Document",
     response_class=PlainTextResponse,
 )
-async def read_raw_markdown(md_id: str):
+async def read_raw_markdown(md_id: str, request: Request):
     """Fetch the raw markdown content of a document by its ID."""
     logger.info(f"Raw markdown requested: {md_id}")
 
     try:
-        from .db import get_markdown_document
-
-        document = await get_markdown_document(md_id)
+        from .db import get_markdown_document, get_markdown_document_meta, load_content, iter_content
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            # Revalidation only needs the content hash, not the content
+            meta = await get_markdown_document_meta(md_id, secondary_ok=True)
+            if meta and meta.content_hash:
+                etag = make_etag(meta.content_hash)
+                matched = etag_matches(if_none_match, etag)
+                if matched:
+                    return not_modified(matched)
+
+        # Content is loaded below only if it has to be, so GridFS content can be streamed
+        document = await get_markdown_document(md_id, load=False, secondary_ok=True)
         if not document:
             logger.warning(f"Document not found: {md_id}")
             return Response(
                 content="Document not found", status_code=404, media_type="text/plain"
             )
 
-        return Response(content=document.content, media_type="text/markdown")
+        if document.content_storage is None:
+            document_size.observe(len(document.content), endpoint="raw")
+        else:
+            document_size.observe(document.content_size or 0, endpoint="raw")
+        digest = document.content_hash or content_hash(document.content)
+        etag = make_etag(digest)
+        matched = etag_matches(if_none_match, etag)
+        if matched:
+            return not_modified(matched)
+
+        variants = page_cache.get(md_id, digest, "raw")
+        if variants is None and document.content_storage == "gridfs":
+            # Too large to hold (or cache) in memory, stream the stored chunks
+            return StreamingResponse(
+                iter_content(document),
+                media_type="text/markdown",
+                headers={**cache_headers(etag), "Content-Length": str(document.content_size)},
+            )
+        if variants is None:
+            await load_content(document)
+            variants = await render_executor.run(
+                compress_variants, document.content.encode("utf-8")
+            )
+            page_cache.put(md_id, digest, "raw", variants, size=variants_size(variants))
+
+        return encoded_response(
+            variants,
+            request.headers.get("accept-encoding"),
+            media_type="text/markdown",
+            headers=cache_headers(etag),
+        )
     except Exception as e:
         logger.error(f"Error fetching raw markdown document {md_id}: {e}")
         raise
@@ -175,12 +355,159 @@ async def render_markdown_endpoint(
     logger.info(f"Arbitrary markdown rendering requested from {request.client.host}")
 
     try:
-        return render_md_page(md, request=request, title=title)
+        html_content = await render_markdown_offloaded(md)
+        return render_html_page(html_content, request=request, title=title)
     except Exception as e:
         logger.error(f"Error rendering arbitrary markdown: {e}")
         raise
 
 
+# Largest markdown snippet accepted by POST /r, in bytes
+SNIPPET_MAX_BYTES = int(os.getenv("SNIPPET_MAX_BYTES", str(1024 * 1024)))
+# New snippets each client may store per minute (0 for no limit)
+SNIPPET_CLIENT_LIMIT = int(os.getenv("SNIPPET_CLIENT_LIMIT", "30"))
+# Snippets stored in total before POST /r stops accepting new ones (0 for no limit)
+SNIPPET_MAX_COUNT = int(os.getenv("SNIPPET_MAX_COUNT", "100000"))
+# Seconds an unknown hash is remembered in snippet_cache, so repeated requests don't reach the database
+SNIPPET_NEGATIVE_TTL = float(os.getenv("SNIPPET_NEGATIVE_TTL", "5"))
+SNIPPET_HASH_RE = re.compile(r"[0-9a-f]{64}")
+
+# New snippets per (client, minute), and the snippet count (refreshed every minute)
+snippet_clients = TTLCache(ttl=60, max_entries=100000)
+snippet_count = TTLCache(ttl=60, max_entries=1)
+
+
+def snippet_client_allowed(client: str) -> bool:
+    """Count a new snippet against its client's limit for the current minute."""
+    if SNIPPET_CLIENT_LIMIT <= 0:
+        return True
+    key = (client, int(time.time() // 60))
+    stored = snippet_clients.get(key)
+    stored = 0 if stored is MISSING else stored
+    if stored >= SNIPPET_CLIENT_LIMIT:
+        return False
+    snippet_clients.put(key, stored + 1)
+    return True
+
+
+async def snippet_storage_full() -> bool:
+    """Whether SNIPPET_MAX_COUNT snippets are stored (counted at most once a minute)."""
+    if SNIPPET_MAX_COUNT <= 0:
+        return False
+    count = snippet_count.get("snippets")
+    if count is MISSING:
+        from .db import count_snippets
+
+        count = await count_snippets()
+        snippet_count.put("snippets", count)
+    return count >= SNIPPET_MAX_COUNT
+
+
+@app.post(
+    "/r",
+    tags=["API", "Render"],
+    name="Store markdown for rendering by content hash",
+)
+async def store_render_snippet(request: Request):
+    """Store markdown content provided in json body and return its content-addressed URL.
+
+    Posting the same markdown and title again returns the same hash, so
+    /r/{hash} pages can be cached by clients and shared caches. No API key is
+    needed (the editor uses it), so new snippets are limited per client and
+    in total.
+    """
+    try:
+        data = await request.json()
+        md = str(data.get("md", ""))
+        title = str(data.get("title", "Document"))
+    except Exception as e:
+        logger.error(f"Error parsing snippet body: {e}")
+        return Response(content="Invalid request body", status_code=400, media_type="text/plain")
+    if len(md.encode("utf-8")) > SNIPPET_MAX_BYTES:
+        return Response(content="Snippet too large", status_code=413, media_type="text/plain")
+
+    digest = snippet_hash(md, title)
+    # True once stored; False (not found by GET /r) still needs storing
+    if snippet_cache.get(digest) is not True:
+        from .db import store_snippet
+
+        client = request.client.host if request.client else "unknown"
+        if await snippet_storage_full():
+            logger.warning(f"Render snippet storage full, rejected snippet from {client}")
+            return Response(content="Snippet storage is full", status_code=507, media_type="text/plain")
+        if not snippet_client_allowed(client):
+            logger.warning(f"Render snippet limit reached for {client}")
+            return Response(
+                content="Too many snippets, try again later",
+                status_code=429,
+                media_type="text/plain",
+                headers={"Retry-After": "60"},
+            )
+        await store_snippet(digest, title, md)
+        snippet_cache.put(digest, True)
+        logger.info(f"Render snippet stored: {digest}")
+    return {"hash": digest, "url": f"/r/{digest}"}
+
+
+@app.get(
+    "/r/{digest}",
+    tags=["UI", "Render"],
+    name="Render stored markdown by content hash",
+    response_class=HTMLResponse,
+)
+async def read_render_snippet(digest: str, request: Request):
+    """Render markdown stored with POST /r."""
+    logger.info(f"Render snippet requested: {digest}")
+    if not SNIPPET_HASH_RE.fullmatch(digest):
+        return Response(content="Snippet not found", status_code=404, media_type="text/plain")
+
+    try:
+        from .db import get_snippet, touch_snippet
+
+        known = snippet_cache.get(digest)
+        if known is MISSING:
+            # Not seen for SNIPPET_CACHE_TTL: check that it still exists and
+            # mark it as used, so snippets that are read don't expire
+            known = await touch_snippet(digest)
+            snippet_cache.put(digest, known, ttl=None if known else SNIPPET_NEGATIVE_TTL)
+        if not known:
+            logger.warning(f"Render snippet not found: {digest}")
+            return Response(content="Snippet not found", status_code=404, media_type="text/plain")
+
+        # Snippets are immutable, so a matching ETag needs no content
+        etag = page_etag(digest)
+        matched = etag_matches(request.headers.get("if-none-match"), etag)
+        if matched:
+            return not_modified(matched, SNIPPET_CACHE_CONTROL)
+
+        cache_key = f"r:{digest}"
+        variants = page_cache.get(cache_key, digest, etag)
+        if variants is None:
+            snippet = await get_snippet(digest)
+            if not snippet:
+                logger.warning(f"Render snippet not found: {digest}")
+                snippet_cache.put(digest, False, ttl=SNIPPET_NEGATIVE_TTL)
+                return Response(content="Snippet not found", status_code=404, media_type="text/plain")
+
+            html_content = await render_cached_markdown(cache_key, snippet.content, digest=digest)
+            page = render_html_page(html_content, request=request, title=snippet.title)
+            variants = await render_executor.run(compress_variants, page.body)
+            page_cache.put(cache_key, digest, etag, variants, size=variants_size(variants))
+
+        return encoded_response(
+            variants,
+            request.headers.get("accept-encoding"),
+            media_type="text/html; charset=utf-8",
+            headers=cache_headers(etag, SNIPPET_CACHE_CONTROL),
+        )
+    except RenderError:
+        # Shown without an ETag and not cached, so the next request tries again
+        return render_html_page(RENDER_ERROR_HTML, request=request, title=snippet.title)
+    except Exception as e:
+        logger.error(f"Error rendering snippet {digest}: {e}")
+        raise
+
+
 @app.post(
     "/render-embed",
     tags=["API", "Render"],
@@ -194,13 +521,118 @@ async def render_markdown_embed(request: Request):
     try:
         data = await request.json()
         md = data.get("md", "")
-        return render_markdown(md)
+        return await render_markdown_offloaded(md)
     except Exception as e:
         logger.error(f"Error rendering embedded markdown: {e}")
         raise
 
 
+@app.post(
+    "/render-blocks",
+    tags=["API", "Render"],
+    name="Render HTML blocks incrementally from a JSON body",
+)
+async def render_markdown_blocks_endpoint(request: Request):
+    """Render markdown content provided in json body as a patch of top-level blocks.
+
+    The body has the markdown (md) and the keys of the blocks the client
+    already has (known). The response lists the key of every block in order,
+    with HTML only for blocks the client doesn't know.
+    """
+    logger.info(f"Incremental markdown rendering requested from {request.client.host}")
+
+    try:
+        data = await request.json()
+        md = data.get("md", "")
+        known = set(data.get("known", []))
+        blocks = await render_executor.run(render_markdown_blocks, md)
+        return {
+            "order": [key for key, _ in blocks],
+            "html": {key: html for key, html in blocks if key not in known},
+        }
+    except Exception as e:
+        logger.error(f"Error rendering markdown blocks: {e}")
+        raise
+
+
+@app.websocket("/ws/render")
+async def render_websocket(websocket: WebSocket):
+    """Live render channel for the editor.
+
+    Clients send the same JSON as /render-blocks, plus a request id. Messages
+    that arrive while a render is running are coalesced: only the latest is
+    rendered next, and a result superseded before it is sent is dropped.
+    """
+    await websocket.accept()
+    client = websocket.client.host if websocket.client else "unknown"
+    logger.info(f"Render socket opened from {client}")
+
+    latest = None
+    closed = False
+    ready = asyncio.Event()
+
+    async def receive():
+        nonlocal latest, closed
+        try:
+            while True:
+                latest = await websocket.receive_json()
+                ready.set()
+        except (WebSocketDisconnect, ValueError):
+            pass  # Disconnected, or sent something other than JSON
+        finally:
+            closed = True
+            ready.set()
+
+    receiver = asyncio.create_task(receive())
+    renders = superseded = 0
+    try:
+        while True:
+            await ready.wait()
+            ready.clear()
+            if closed:
+                break
+            message = latest
+            if not isinstance(message, dict):
+                continue
+            try:
+                blocks = await render_executor.run(render_markdown_blocks, str(message.get("md", "")))
+            except HTTPException as e:
+                # Render queue full or render timed out
+                await websocket.send_json({"id": message.get("id"), "error": e.detail})
+                continue
+            renders += 1
+            await asyncio.sleep(0)  # Let the receiver pick up messages sent during an inline render
+            if ready.is_set():
+                # A newer message arrived while rendering, render that instead
+                superseded += 1
+                continue
+            known = set(message.get("known", []))
+            await websocket.send_json(
+                {
+                    "id": message.get("id"),
+                    "order": [key for key, _ in blocks],
+                    "html": {key: html for key, html in blocks if key not in known},
+                }
+            )
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Error in render socket from {client}: {e}")
+        await websocket.close(code=1011)
+    finally:
+        receiver.cancel()
+        logger.info(f"Render socket closed from {client} ({renders} renders, {superseded} superseded)")
+
+
 @app.get("/health", tags=["UI"])
 async def health_check():
     """Health check endpoint."""
     return {"status": "ok"}
+
+
+@app.get("/metrics", tags=["UI"], include_in_schema=False)
+async def metrics():
+    """Metrics in the Prometheus text exposition format."""
+    if not metrics_enabled():
+        return Response(content="Not Found", status_code=404, media_type="text/plain")
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE)
@@ -2,114 +2,70 @@
 
 # Markdown imports
 from markdown_it import MarkdownIt
-from mdit_py_plugins.tasklists import tasklists_plugin
-from mdit_py_plugins.anchors import anchors_plugin
-from mdit_py_plugins.front_matter import front_matter_plugin
-from mdit_py_plugins.admon import admon_plugin
-from bleach import clean
+from markdown_it.common.html_re import open_tag, close_tag, comment, processing, declaration, cdata
+from markdown_it.common.utils import escapeHtml
+from markdown_it.renderer import RendererHTML
+from markdown_it.token import Token
+from markdown_it.utils import EnvType, OptionsDict
 
 # Actually needed imports
-from fastapi import Request
+from starlette.requests import Request  # fastapi.Request, without importing all of FastAPI
+from collections.abc import Iterator, Sequence
+import functools
+import hashlib
+import html
+import json
 import os
+import re
 from md_server.constants import APP_NAME
-from md_server.templates import templates
+from md_server.templates import templates, TEMPLATE_VERSION
+from .cache import render_cache, block_cache, content_hash
+from .executor import render_executor
+from .etag import make_etag
+from .metrics import render_stage_duration
 from .logging_config import get_logger
 
+# How rendered HTML is sanitized: "bleach" (post-pass over the output) or
+# "renderer" (allowlist applied while rendering tokens)
+HTML_SANITIZER = os.getenv("HTML_SANITIZER", "bleach").lower()
+
+# Bump whenever rendered output changes (plugins, enhancements, sanitizer allowlist)
+# so cached renderings are not served for the new renderer.
+RENDERER_REVISION = "3"
+RENDERER_VERSION = f"{RENDERER_REVISION}-{HTML_SANITIZER}"
+
+# Documents at least this long (in characters) are streamed by /d/{id} when they
+# have to be rendered; 0 disables streaming
+STREAM_MIN_SIZE = int(os.getenv("STREAM_MIN_SIZE", str(1024 * 1024)))
+# Approximate size of each streamed chunk of rendered HTML
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "65536"))
+# Stands in for the document body when splitting the page template
+CONTENT_PLACEHOLDER = "<!-- md-server:content -->"
+# Shown in place of markdown that failed to render
+RENDER_ERROR_HTML = "<p>Error rendering markdown content.</p>"
+
+
+class RenderError(Exception):
+    """Markdown failed to render (raised instead of returning RENDER_ERROR_HTML)."""
+
 
 # Prism.js-compatible code block formatting
-def highlight_code(code: str, lang: str | None) -> str:
+def highlight_code(code: str, lang: str | None, escape: bool = False) -> str:
     """Format code blocks for Prism.js client-side highlighting."""
     # Return raw code - Prism.js will handle the highlighting on the client side
     # This is much faster than server-side highlighting
+    if escape:
+        # Nothing sanitizes the output afterwards, so escape here
+        code, lang = html.escape(code, quote=False), escapeHtml(lang) if lang else lang
     lang_class = f"language-{lang}" if lang else "language-text"
     return f'<pre><code class="{lang_class}">{code}</code></pre>'
 
 
 logger = get_logger(__name__)
-md = MarkdownIt("gfm-like", {"html": True, "linkify": False, "typographer": True})
-# Attach a highlight function for Prism.js compatibility
-md.options["highlight"] = lambda code, lang, _: highlight_code(code, lang)
-
-# Add useful plugins
-md.use(tasklists_plugin)  # task lists: - [ ] / - [x]
-md.use(anchors_plugin)  # heading anchors/permalinks
-md.use(front_matter_plugin)  # front matter parsing (if you want it)
-md.use(admon_plugin)  # admonitions: !!! note/warning etc.
-
-
-def enhance_admonitions(html: str) -> str:
-    """Post-process HTML to enhance admonition structure with custom elements."""
-    import re
-
-    # Icon mapping for different admonition types
-    icons = {
-        "note": "edit_square",
-        "info": "ℹnfo",
-        "tip": "emoji_objects",
-        "hint": "emoji_objects",
-        "important": "exclamation",
-        "attention": "exclamation",
-        "warning": "warning",
-        "caution": "warning",
-        "danger": "error",
-        "error": "error",
-        "failure": "error",
-        "success": "check_circle",
-        "check": "check_circle",
-        "question": "question_mark",
-        "bug": "bug_report",
-        "quote": "format_quote",
-        "example": "note_alt",
-        "abstract": "note_alt",
-        "summary": "notes",
-    }
-
-    def replace_admonition(match):
-        full_match = match.group(0)
-        classes = match.group(1)
-        title_content = match.group(2)
-        body_content = match.group(3)
-
-        # Extract admonition type from classes
-        admon_type = "note"  # default
-        for cls in classes.split():
-            if cls != "admonition" and cls in icons:
-                admon_type = cls
-                break
-
-        icon = icons.get(admon_type, "ℹ️")
-
-        # Build enhanced structure
-        # + Really stupid icon
-        enhanced = f"""
-<div class="admonition admonition-{admon_type}">
-    <div class="admonition-indicator"></div>
-    <div class="admonition-container">
-        <div class="admonition-header">
-            <div class="admonition-icon">
-                <span class="icon">{icon}</span>
-            </div>
-            <div class="admonition-title">{title_content}</div>
-        </div>
-        <div class="admonition-content">{body_content}</div>
-    </div>
-</div>"""
-
-        return enhanced
-
-    # Pattern to match standard admonition HTML structure
-    # Matches: <div class="admonition TYPE"><p class="admonition-title">TITLE</p>CONTENT</div>
-    pattern = r'<div class="([^"]*admonition[^"]*)">\s*<p class="admonition-title">([^<]*)</p>\s*(.*?)\s*</div>'
-
-    # Replace all admonitions with enhanced structure
-    enhanced_html = re.sub(pattern, replace_admonition, html, flags=re.DOTALL)
 
-    return enhanced_html
-
-
-def clean_html(html: str) -> str:
-    """Sanitize HTML to prevent XSS attacks."""
-    allowed_tags = [
+# Sanitizer allowlist
+ALLOWED_TAGS = frozenset(
+    [
         "a",
         "abbr",
         "acronym",
@@ -142,12 +98,384 @@ def clean_html(html: str) -> str:
         "th",
         "td",
     ]
-    allowed_attributes = {
-        "*": ["class", "id"],
-        "a": ["href", "title"],
-        "img": ["src", "alt", "title"],
-    }
-    cleaned_html = clean(html, tags=allowed_tags, attributes=allowed_attributes)
+)
+ALLOWED_ATTRIBUTES = {
+    "*": ["class", "id"],
+    "a": ["href", "title"],
+    "img": ["src", "alt", "title"],
+}
+ALLOWED_PROTOCOLS = frozenset(["http", "https", "mailto"])
+URL_ATTRIBUTES = frozenset(["href", "src"])
+
+# Raw HTML scanning for the render-time sanitizer
+RAW_HTML_RE = re.compile("|".join([open_tag, close_tag, comment, processing, declaration, cdata]))
+TAG_NAME_RE = re.compile(r"</?([A-Za-z][A-Za-z0-9\-]*)")
+ATTRIBUTE_RE = re.compile(r"""([a-zA-Z_:][a-zA-Z0-9:._-]*)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^"'=<>`\x00-\x20]+)))?""")
+URL_SCHEME_RE = re.compile(r"^([a-zA-Z][a-zA-Z0-9+.\-]*):")
+# Ignored by browsers when parsing a URL scheme (stripped the same way by bleach)
+URL_IGNORED_RE = re.compile(r"[`\x00-\x20\x7f-\xa0\s\ufffd]+")
+BARE_AMPERSAND_RE = re.compile(r"&(?!#?[a-zA-Z0-9]+;)")
+# Raw tags that are never closed, and ones only valid inside an open <table>
+VOID_TAGS = frozenset(["br", "hr", "img"])
+TABLE_PART_TAGS = frozenset(["thead", "tbody", "tr", "th", "td"])
+# Key of the RawTagBalancer in the markdown-it env while SanitizingRenderer renders
+RAW_TAGS_ENV = "raw_html_tags"
+
+# Icon mapping for different admonition types
+ADMONITION_ICONS = {
+    "note": "edit_square",
+    "info": "ℹnfo",
+    "tip": "emoji_objects",
+    "hint": "emoji_objects",
+    "important": "exclamation",
+    "attention": "exclamation",
+    "warning": "warning",
+    "caution": "warning",
+    "danger": "error",
+    "error": "error",
+    "failure": "error",
+    "success": "check_circle",
+    "check": "check_circle",
+    "question": "question_mark",
+    "bug": "bug_report",
+    "quote": "format_quote",
+    "example": "note_alt",
+    "abstract": "note_alt",
+    "summary": "notes",
+}
+
+# Enhanced admonition structure
+# + Really stupid icon
+ADMONITION_TEMPLATE = """
+<div class="admonition admonition-{admon_type}">
+    <div class="admonition-indicator"></div>
+    <div class="admonition-container">
+        <div class="admonition-header">
+            <div class="admonition-icon">
+                <span class="icon">{icon}</span>
+            </div>
+            <div class="admonition-title">{title}</div>
+        </div>
+        <div class="admonition-content">{body}</div>
+    </div>
+</div>"""
+
+# Pattern to match standard admonition HTML structure (legacy post-pass)
+# Matches: <div class="admonition TYPE"><p class="admonition-title">TITLE</p>CONTENT</div>
+ADMONITION_PATTERN = re.compile(
+    r'<div class="([^"]*admonition[^"]*)">\s*<p class="admonition-title">([^<]*)</p>\s*(.*?)\s*</div>',
+    flags=re.DOTALL,
+)
+
+
+def admonition_type(classes: str) -> str:
+    """Extract the admonition type from its CSS classes."""
+    for cls in classes.split():
+        if cls != "admonition" and cls in ADMONITION_ICONS:
+            return cls
+    return "note"  # default
+
+
+def format_admonition(classes: str, title: str, body: str) -> str:
+    """Build the enhanced admonition markup."""
+    admon_type = admonition_type(classes)
+    return ADMONITION_TEMPLATE.format(
+        admon_type=admon_type,
+        icon=ADMONITION_ICONS.get(admon_type, "ℹ️"),
+        title=title,
+        body=body,
+    )
+
+
+class MarkdownRenderer(RendererHTML):
+    """HTML renderer that emits the enhanced admonition structure directly.
+
+    Admonition tokens from admon_plugin are rendered as a unit (header, icon,
+    title and content), so no post-processing pass over the HTML is needed.
+    """
+
+    def render(self, tokens: Sequence[Token], options: OptionsDict, env: EnvType) -> str:
+        result = ""
+        rules = self.rules
+        skip_to = 0
+
+        for i, token in enumerate(tokens):
+            if i < skip_to:
+                continue  # Already rendered as part of an admonition
+            if token.type == "inline":
+                if token.children:
+                    result += self.renderInline(token.children, options, env)
+            elif token.type == "admonition_open":
+                close = self._find_admonition_close(tokens, i)
+                result += self.render_admonition(tokens, i, close, options, env)
+                skip_to = close + 1
+            elif token.type in rules:
+                result += rules[token.type](tokens, i, options, env)
+            else:
+                result += self.renderToken(tokens, i, options, env)
+
+        return result
+
+    def render_admonition(
+        self, tokens: Sequence[Token], start: int, close: int, options: OptionsDict, env: EnvType
+    ) -> str:
+        """Render the admonition spanning tokens[start:close + 1]."""
+        body_start = start + 1
+        title = ""
+        if tokens[body_start].type == "admonition_title_open":
+            inline = tokens[body_start + 1]
+            title = self.renderInline(inline.children or [], options, env)
+            body_start += 3  # title open, inline, title close
+
+        body = self.render(tokens[body_start:close], options, env)
+        html = format_admonition(tokens[start].attrGet("class") or "", title, body.strip())
+        return html + "\n"  # Block-level close, as RendererHTML would emit
+
+    @staticmethod
+    def _find_admonition_close(tokens: Sequence[Token], start: int) -> int:
+        """Find the index of the admonition_close token matching tokens[start]."""
+        depth = 0
+        for i in range(start, len(tokens)):
+            if tokens[i].type == "admonition_open":
+                depth += 1
+            elif tokens[i].type == "admonition_close":
+                depth -= 1
+                if depth == 0:
+                    return i
+        return len(tokens)  # Unclosed, render until the end
+
+
+def attribute_allowed(tag: str, name: str, value: str) -> bool:
+    """Check an attribute against the sanitizer allowlist."""
+    if name not in ALLOWED_ATTRIBUTES["*"] and name not in ALLOWED_ATTRIBUTES.get(tag, ()):
+        return False
+    if name in URL_ATTRIBUTES:
+        return url_allowed(value)
+    return True
+
+
+def url_allowed(value: str) -> bool:
+    """Check a (decoded) URL's scheme against ALLOWED_PROTOCOLS.
+
+    Whitespace and control characters are removed first, as browsers ignore
+    them ("java\tscript:"). Relative URLs are allowed; a URL with a colon
+    before any path, query or fragment but no valid scheme is not.
+    """
+    normalized = URL_IGNORED_RE.sub("", value)
+    scheme, colon, _ = normalized.partition(":")
+    if not colon or any(c in scheme for c in "/?#"):
+        return True  # Relative URL
+    match = URL_SCHEME_RE.match(normalized)
+    return bool(match) and match.group(1).lower() in ALLOWED_PROTOCOLS
+
+
+def escape_tag(markup: str) -> str:
+    """Escape a disallowed tag so it is displayed as text (as bleach does)."""
+    return markup.replace("<", "&lt;").replace(">", "&gt;")
+
+
+class RawTagBalancer:
+    """Keeps the raw HTML tags of one rendered document balanced.
+
+    Closing tags without a matching open tag are dropped, tags left open are
+    closed (see close_all) and table parts outside of a <table> are dropped,
+    so raw HTML can't close or swallow the markup around the document.
+    """
+
+    def __init__(self):
+        self.open_tags: list[str] = []
+        # Tags below this index were opened outside the current inline run,
+        # which can't close them
+        self.base = 0
+
+    def open(self, tag: str) -> bool:
+        """Record an opening tag. Returns False if it should be dropped."""
+        if tag in TABLE_PART_TAGS and "table" not in self.open_tags:
+            return False
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+        return True
+
+    def close(self, tag: str) -> str:
+        """Close a tag and any tags opened after it, or drop a stray closing tag."""
+        if tag not in self.open_tags[self.base :]:
+            return ""
+        closed = ""
+        while True:
+            name = self.open_tags.pop()
+            closed += f"</{name}>"
+            if name == tag:
+                return closed
+
+    def close_all(self, base: int = 0) -> str:
+        """Close every tag opened since open_tags[base]."""
+        closed = "".join(f"</{tag}>" for tag in reversed(self.open_tags[base:]))
+        del self.open_tags[base:]
+        return closed
+
+
+def sanitize_raw_tag(markup: str, balancer: RawTagBalancer = None) -> str:
+    """Sanitize a single raw HTML tag, comment or declaration."""
+    name_match = TAG_NAME_RE.match(markup)
+    if not name_match:
+        return ""  # Comments, processing instructions, declarations and CDATA are dropped
+
+    tag = name_match.group(1).lower()
+    if tag not in ALLOWED_TAGS:
+        return escape_tag(markup)
+    if markup.startswith("</"):
+        return balancer.close(tag) if balancer is not None else f"</{tag}>"
+    if balancer is not None and not balancer.open(tag):
+        return ""
+
+    result = "<" + tag
+    for attr in ATTRIBUTE_RE.finditer(markup, name_match.end()):
+        name = attr.group(1).lower()
+        value = html.unescape(next((v for v in attr.groups()[1:] if v is not None), ""))
+        if attribute_allowed(tag, name, value):
+            result += f' {name}="{escapeHtml(value)}"'
+    return result + ">"
+
+
+def sanitize_raw_html(markup: str, balancer: RawTagBalancer = None) -> str:
+    """Sanitize raw HTML from html_block/html_inline tokens.
+
+    Allowed tags are rebuilt with allowed attributes only, disallowed tags are
+    escaped and everything between tags is escaped as text. With a balancer,
+    allowed tags are also kept balanced.
+    """
+    result = ""
+    pos = 0
+    for match in RAW_HTML_RE.finditer(markup):
+        result += escape_raw_text(markup[pos : match.start()])
+        result += sanitize_raw_tag(match.group(0), balancer)
+        pos = match.end()
+    return result + escape_raw_text(markup[pos:])
+
+
+def escape_raw_text(text: str) -> str:
+    """Escape text found in raw HTML, keeping existing entities."""
+    return BARE_AMPERSAND_RE.sub("&amp;", text).replace("<", "&lt;").replace(">", "&gt;")
+
+
+class SanitizingRenderer(MarkdownRenderer):
+    """MarkdownRenderer that applies the sanitizer allowlist while rendering.
+
+    Tags produced by markdown-it are checked against ALLOWED_TAGS and
+    ALLOWED_ATTRIBUTES as they are rendered, and raw HTML tokens are filtered
+    on their own, so the output never needs to be re-parsed by bleach. Raw
+    tags are balanced over the whole render (see RawTagBalancer); tags opened
+    by raw HTML inside inline content are closed at the end of that content.
+    """
+
+    def render(self, tokens: Sequence[Token], options: OptionsDict, env: EnvType) -> str:
+        if RAW_TAGS_ENV in env:  # Nested render, e.g. an admonition body
+            return super().render(tokens, options, env)
+        env[RAW_TAGS_ENV] = balancer = RawTagBalancer()
+        try:
+            return super().render(tokens, options, env) + balancer.close_all()
+        finally:
+            del env[RAW_TAGS_ENV]
+
+    def renderInline(self, tokens: Sequence[Token], options: OptionsDict, env: EnvType) -> str:
+        balancer = env.get(RAW_TAGS_ENV)
+        if balancer is None:
+            return super().renderInline(tokens, options, env)
+        outer_base, balancer.base = balancer.base, len(balancer.open_tags)
+        try:
+            return super().renderInline(tokens, options, env) + balancer.close_all(balancer.base)
+        finally:
+            balancer.base = outer_base
+
+    def renderToken(self, tokens: Sequence[Token], idx: int, options: OptionsDict, env: EnvType) -> str:
+        result = super().renderToken(tokens, idx, options, env)
+        if tokens[idx].tag not in ALLOWED_TAGS:
+            return escape_tag(result)
+        return result
+
+    def renderAttrs(self, token: Token) -> str:
+        if token.tag not in ALLOWED_TAGS:
+            return RendererHTML.renderAttrs(token)  # Escaped as a whole by renderToken
+
+        result = ""
+        for key, value in token.attrItems():
+            if attribute_allowed(token.tag, key, html.unescape(str(value))):
+                result += " " + escapeHtml(key) + '="' + escapeHtml(str(value)) + '"'
+        return result
+
+    def html_block(self, tokens: Sequence[Token], idx: int, options: OptionsDict, env: EnvType) -> str:
+        return sanitize_raw_html(tokens[idx].content, env.get(RAW_TAGS_ENV))
+
+    def html_inline(self, tokens: Sequence[Token], idx: int, options: OptionsDict, env: EnvType) -> str:
+        return sanitize_raw_html(tokens[idx].content, env.get(RAW_TAGS_ENV))
+
+
+def create_markdown_it(renderer_cls: type[RendererHTML] = None) -> MarkdownIt:
+    """Create a configured MarkdownIt parser.
+
+    Args:
+        renderer_cls (type[RendererHTML]): Renderer class to use. Defaults to
+            SanitizingRenderer or MarkdownRenderer depending on HTML_SANITIZER.
+
+    Returns:
+        MarkdownIt: The configured parser.
+    """
+    if renderer_cls is None:
+        renderer_cls = SanitizingRenderer if HTML_SANITIZER == "renderer" else MarkdownRenderer
+    sanitizing = issubclass(renderer_cls, SanitizingRenderer)
+
+    parser = MarkdownIt(
+        "gfm-like",
+        # Void tags are written as <br>, matching bleach's serializer
+        {"html": True, "linkify": False, "typographer": True, "xhtmlOut": not sanitizing},
+        renderer_cls=renderer_cls,
+    )
+    # Attach a highlight function for Prism.js compatibility
+    parser.options["highlight"] = lambda code, lang, _: highlight_code(code, lang, escape=sanitizing)
+
+    # Add useful plugins (imported here, so importing this module stays cheap)
+    from mdit_py_plugins.tasklists import tasklists_plugin
+    from mdit_py_plugins.anchors import anchors_plugin
+    from mdit_py_plugins.front_matter import front_matter_plugin
+    from mdit_py_plugins.admon import admon_plugin
+
+    parser.use(tasklists_plugin)  # task lists: - [ ] / - [x]
+    parser.use(anchors_plugin)  # heading anchors/permalinks
+    parser.use(front_matter_plugin)  # front matter parsing (if you want it)
+    parser.use(admon_plugin)  # admonitions: !!! note/warning etc.
+    return parser
+
+
+@functools.cache
+def get_markdown_it() -> MarkdownIt:
+    """The shared parser, created on first use rather than at import."""
+    return create_markdown_it()
+
+
+def enhance_admonitions(html: str) -> str:
+    """Post-process HTML to enhance admonition structure with custom elements.
+
+    Legacy regex pass, superseded by MarkdownRenderer. Only used to render
+    with a plain RendererHTML (e.g. for benchmarking against the token path).
+    """
+
+    def replace_admonition(match):
+        return format_admonition(match.group(1), match.group(2), match.group(3))
+
+    # Replace all admonitions with enhanced structure
+    return ADMONITION_PATTERN.sub(replace_admonition, html)
+
+
+def clean_html(html: str) -> str:
+    """Sanitize HTML to prevent XSS attacks."""
+    from bleach import clean  # Only needed with HTML_SANITIZER=bleach
+
+    cleaned_html = clean(
+        html,
+        tags=ALLOWED_TAGS,
+        attributes=ALLOWED_ATTRIBUTES,
+        protocols=ALLOWED_PROTOCOLS,
+    )
     return cleaned_html
 
 
@@ -158,16 +486,20 @@ def get_name() -> str:
     return os.getenv("APP_NAME", APP_NAME)
 
 
-def render_markdown(md_text: str) -> str:
+def render_markdown(md_text: str, fallback: bool = True) -> str:
     """Render markdown text to HTML using Markdown-it.
 
     Args:
         md_text (str): The markdown text to render.
+        fallback (bool): Return RENDER_ERROR_HTML if rendering fails, instead
+            of raising RenderError. Rendered HTML that is cached or stored
+            must not fall back, or the error would outlive its cause.
 
     Returns:
         str: The rendered HTML.
     """
-    html_jobs = [enhance_admonitions, clean_html]
+    # The renderer-level sanitizer already applied the allowlist
+    html_jobs = [] if HTML_SANITIZER == "renderer" else [clean_html]
 
     logger.debug(f"Rendering markdown content of length: {len(md_text)}")
 
@@ -175,17 +507,264 @@ def render_markdown(md_text: str) -> str:
         logger.warning("Empty markdown content provided")
         return f"<p> This document has no content. </p>"
 
+    md = get_markdown_it()
     try:
-        html = md.render(md_text)
+        env = {}
+        with render_stage_duration.time(stage="parse"):
+            tokens = md.parse(md_text, env)
+        with render_stage_duration.time(stage="render"):
+            html = md.renderer.render(tokens, md.options, env)
 
         # Apply HTML enhancement jobs
         for job in html_jobs:
-            html = job(html)
+            with render_stage_duration.time(stage=job.__name__):
+                html = job(html)
         logger.debug("Markdown rendering and enhancement completed successfully")
         return html
     except Exception as e:
         logger.error(f"Error rendering markdown: {e}")
-        return f"<p>Error rendering markdown content.</p>"
+        if not fallback:
+            raise RenderError(str(e)) from e
+        return RENDER_ERROR_HTML
+
+
+def top_level_blocks(tokens: Sequence[Token]) -> Iterator[tuple[int, int]]:
+    """Yield the (start, end) token ranges of each top-level block."""
+    start = 0
+    for i, token in enumerate(tokens):
+        # A top-level block ends at a level 0 token that doesn't open a container
+        if token.level == 0 and token.nesting != 1:
+            yield start, i + 1
+            start = i + 1
+    if start < len(tokens):
+        yield start, len(tokens)
+
+
+def block_key(tokens: Sequence[Token], start: int, end: int, lines: list[str], references: str) -> str | None:
+    """Cache key for a top-level block, from its source and the context it renders in.
+
+    Besides the source lines, a block's HTML depends on heading anchor ids
+    (deduplicated across the document) and link reference definitions, so
+    both are part of the key. Returns None if the block has no source map.
+    """
+    source_map = tokens[start].map
+    if source_map is None:
+        return None
+    anchors = [token.attrGet("id") or "" for token in tokens[start:end] if token.type == "heading_open"]
+    key = "\n".join(lines[source_map[0]:source_map[1]]) + "\0" + "\0".join(anchors) + "\0" + references
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+
+def has_raw_html(tokens: Sequence[Token]) -> bool:
+    """Whether parsed markdown contains raw HTML, as blocks or inline."""
+    for token in tokens:
+        if token.type == "html_block":
+            return True
+        if token.type == "inline" and any(child.type == "html_inline" for child in token.children or ()):
+            return True
+    return False
+
+
+def render_markdown_blocks(md_text: str) -> list[tuple[str, str]]:
+    """Render markdown text to HTML block by block, reusing unchanged blocks.
+
+    Each top-level block is rendered and sanitized on its own and cached by
+    its key (see block_key), so re-rendering an edited document only renders
+    the blocks that changed. The document is still parsed in full.
+
+    Raw HTML tags can span blocks and are balanced over the whole document by
+    the sanitizers, so documents with raw HTML are rendered in full, as a
+    single block.
+
+    Args:
+        md_text (str): The markdown text to render.
+
+    Returns:
+        list[tuple[str, str]]: (block key, HTML) for each block, in order.
+    """
+    html_jobs = [] if HTML_SANITIZER == "renderer" else [clean_html]
+
+    if not md_text.strip():
+        return [("empty", "<p> This document has no content. </p>")]
+
+    md = get_markdown_it()
+    try:
+        env = {}
+        with render_stage_duration.time(stage="parse"):
+            tokens = md.parse(md_text, env)
+        # Line numbers in token maps refer to the normalized source
+        lines = md_text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+        references = json.dumps(env.get("references", {}), sort_keys=True)
+
+        if has_raw_html(tokens):
+            with render_stage_duration.time(stage="render"):
+                html = md.renderer.render(tokens, md.options, env)
+            for job in html_jobs:
+                with render_stage_duration.time(stage=job.__name__):
+                    html = job(html)
+            return [(hashlib.sha256(html.encode("utf-8")).hexdigest()[:16], html)]
+
+        blocks = []
+        for start, end in top_level_blocks(tokens):
+            key = block_key(tokens, start, end, lines, references)
+            html = block_cache.get("editor", key, RENDERER_VERSION) if key else None
+            if html is None:
+                with render_stage_duration.time(stage="render"):
+                    html = md.renderer.render(tokens[start:end], md.options, env)
+                for job in html_jobs:
+                    with render_stage_duration.time(stage=job.__name__):
+                        html = job(html)
+                if key:
+                    block_cache.put("editor", key, RENDERER_VERSION, html)
+                else:
+                    key = hashlib.sha256(html.encode("utf-8")).hexdigest()[:16]
+            blocks.append((key, html))
+        return blocks
+    except Exception as e:
+        logger.error(f"Error rendering markdown: {e}")
+        return [("error", RENDER_ERROR_HTML)]
+
+
+def render_markdown_chunks(
+    md_text: str, chunk_size: int = STREAM_CHUNK_SIZE, fallback: bool = True
+) -> Iterator[str]:
+    """Render markdown text to HTML in chunks of top-level blocks.
+
+    The document is parsed once, then rendered and sanitized roughly
+    chunk_size characters of HTML at a time, so the first chunk is ready long
+    before the whole document is rendered. Chunks always end on a top-level
+    block boundary. Raw HTML tags can span blocks and are balanced over the
+    whole document by the sanitizers, so documents with raw HTML are
+    rendered in one chunk. The chunks join to the same HTML as
+    render_markdown.
+
+    Args:
+        md_text (str): The markdown text to render.
+        chunk_size (int): Approximate size of each chunk, in characters.
+        fallback (bool): Yield RENDER_ERROR_HTML if rendering fails, instead
+            of raising RenderError.
+
+    Yields:
+        str: Consecutive pieces of the rendered HTML.
+    """
+    html_jobs = [] if HTML_SANITIZER == "renderer" else [clean_html]
+
+    if not md_text.strip():
+        logger.warning("Empty markdown content provided")
+        yield f"<p> This document has no content. </p>"
+        return
+
+    md = get_markdown_it()
+    try:
+        env = {}
+        with render_stage_duration.time(stage="parse"):
+            tokens = md.parse(md_text, env)
+        # One range for the whole document if it has raw HTML
+        blocks = [(0, len(tokens))] if has_raw_html(tokens) else top_level_blocks(tokens)
+
+        pending = []
+        pending_size = 0
+        for start, end in blocks:
+            with render_stage_duration.time(stage="render"):
+                block = md.renderer.render(tokens[start:end], md.options, env)
+            pending.append(block)
+            pending_size += len(block)
+            if pending_size >= chunk_size:
+                html = "".join(pending)
+                for job in html_jobs:
+                    with render_stage_duration.time(stage=job.__name__):
+                        html = job(html)
+                yield html
+                pending, pending_size = [], 0
+
+        if pending:
+            html = "".join(pending)
+            for job in html_jobs:
+                with render_stage_duration.time(stage=job.__name__):
+                    html = job(html)
+            yield html
+    except Exception as e:
+        logger.error(f"Error rendering markdown: {e}")
+        if not fallback:
+            raise RenderError(str(e)) from e
+        yield RENDER_ERROR_HTML
+
+
+def page_etag(digest: str) -> str:
+    """ETag for a rendered document page, from its content hash.
+
+    Includes the renderer and template versions, so pages are revalidated
+    after either changes.
+    """
+    return make_etag(digest, RENDERER_VERSION, TEMPLATE_VERSION)
+
+
+def get_stored_html(document) -> str | None:
+    """Return HTML persisted on a document if it was rendered by the current renderer.
+
+    Args:
+        document (MarkdownDocument): The stored markdown document.
+
+    Returns:
+        str | None: The stored HTML, or None if it is missing or stale.
+    """
+    if document.rendered_html is None or document.renderer_version != RENDERER_VERSION:
+        return None
+    return document.rendered_html
+
+
+async def render_markdown_offloaded(md_text: str, fallback: bool = True) -> str:
+    """Render markdown text to HTML without blocking the event loop.
+
+    Large documents are rendered in the render worker pool; small ones inline.
+
+    Args:
+        md_text (str): The markdown text to render.
+        fallback (bool): See render_markdown.
+
+    Returns:
+        str: The rendered HTML.
+    """
+    func = render_markdown if fallback else functools.partial(render_markdown, fallback=False)
+    return await render_executor.run(func, md_text)
+
+
+async def render_stored_html(md_text: str) -> str | None:
+    """Render markdown to be stored with a document (RENDER_ON_SAVE, rerender).
+
+    Returns:
+        str | None: The rendered HTML, or None if rendering failed, in which
+            case nothing should be stored and the document is rendered when
+            it is requested.
+    """
+    try:
+        return await render_markdown_offloaded(md_text, fallback=False)
+    except RenderError:
+        return None
+
+
+async def render_cached_markdown(md_id: str, md_text: str, digest: str = None) -> str:
+    """Render a stored document's markdown, using the in-process render cache.
+
+    Failures are not cached: RenderError is raised instead.
+
+    Args:
+        md_id (str): The markdown document ID.
+        md_text (str): The markdown text of the document.
+        digest (str): The content hash, if already known.
+
+    Returns:
+        str: The rendered HTML.
+    """
+    digest = digest or content_hash(md_text)
+    html_content = render_cache.get(md_id, digest, RENDERER_VERSION)
+    if html_content is not None:
+        logger.debug(f"Render cache hit for document: {md_id}")
+        return html_content
+
+    html_content = await render_markdown_offloaded(md_text, fallback=False)
+    render_cache.put(md_id, digest, RENDERER_VERSION, html_content)
+    return html_content
 
 
 def render_md_page(md_text: str, title: str = None, request: Request = None, md_id: str = None, **kwargs) -> str:
@@ -204,6 +783,25 @@ def render_md_page(md_text: str, title: str = None, request: Request = None, md_
 
     try:
         html_content = render_markdown(md_text)
+        return render_html_page(html_content, title=title, request=request, md_id=md_id, **kwargs)
+    except Exception as e:
+        logger.error(f"Error rendering page '{title or 'Untitled'}': {e}")
+        raise
+
+
+def render_html_page(html_content: str, title: str = None, request: Request = None, md_id: str = None, **kwargs) -> str:
+    """Render a full HTML page around already-rendered markdown HTML.
+
+    Args:
+        html_content (str): The rendered markdown HTML.
+        title (str): The title of the page.
+        request (Request): The FastAPI request object.
+        md_id (str): The markdown document ID (for copy functionality).
+
+    Returns:
+        str: The complete HTML page.
+    """
+    with render_stage_duration.time(stage="template"):
         response = templates.TemplateResponse(
             "markdown.html",
             {
@@ -215,8 +813,73 @@ def render_md_page(md_text: str, title: str = None, request: Request = None, md_
                 **kwargs,
             },
         )
-        logger.debug(f"Page rendered successfully: {title or 'Untitled'}")
-        return response
-    except Exception as e:
-        logger.error(f"Error rendering page '{title or 'Untitled'}': {e}")
-        raise
+    logger.debug(f"Page rendered successfully: {title or 'Untitled'}")
+    return response
+
+
+def render_page_shell(title: str = None, request: Request = None, md_id: str = None, **kwargs) -> tuple[str, str]:
+    """Render the page template without content, split where the content goes.
+
+    Args:
+        title (str): The title of the page.
+        request (Request): The FastAPI request object.
+        md_id (str): The markdown document ID (for copy functionality).
+
+    Returns:
+        tuple[str, str]: The HTML before and after the rendered markdown.
+    """
+    page = render_html_page(CONTENT_PLACEHOLDER, title=title, request=request, md_id=md_id, **kwargs)
+    head, _, tail = page.body.decode("utf-8").partition(CONTENT_PLACEHOLDER)
+    return head, tail
+
+
+def stream_md_page(
+    md_text: str,
+    title: str = None,
+    request: Request = None,
+    md_id: str = None,
+    digest: str = None,
+    **kwargs,
+) -> Iterator[bytes]:
+    """Render a full HTML page as a stream, for large documents.
+
+    The page head (styles, scripts and header) is sent before the markdown is
+    parsed, followed by the rendered body in chunks and then the rest of the
+    page. Meant to be iterated in a worker thread (as StreamingResponse does
+    with a sync iterator). The render counts towards the render pool's queue
+    and timeout (see RenderExecutor.stream). Once the whole body is rendered,
+    it is put in the render cache, as render_cached_markdown would.
+
+    Args:
+        md_text (str): The markdown text to render.
+        title (str): The title of the page.
+        request (Request): The FastAPI request object.
+        md_id (str): The markdown document ID (for copy functionality and the render cache).
+        digest (str): The content hash, if already known.
+
+    Returns:
+        Iterator[bytes]: The encoded page.
+
+    Raises:
+        HTTPException: 503 if the render queue is full.
+    """
+    logger.info(f"Streaming page: {title or 'Untitled'}")
+    head, tail = render_page_shell(title=title, request=request, md_id=md_id, **kwargs)
+    digest = digest or content_hash(md_text)
+
+    def generate() -> Iterator[bytes]:
+        yield head.encode("utf-8")
+        chunks = []
+        try:
+            for chunk in render_markdown_chunks(md_text, fallback=False):
+                chunks.append(chunk)
+                yield chunk.encode("utf-8")
+        except RenderError:
+            # Too late for an error page, and failures are not cached
+            yield RENDER_ERROR_HTML.encode("utf-8")
+        else:
+            if md_id:
+                render_cache.put(md_id, digest, RENDERER_VERSION, "".join(chunks))
+        yield tail.encode("utf-8")
+
+    return render_executor.stream(generate(), len(md_text))
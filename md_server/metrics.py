@@ -0,0 +1,186 @@
+"""Prometheus-compatible metrics for the markdown server."""
+
+import bisect
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
+
+METRICS_PREFIX = "md_server"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STAGE_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SIZE_BUCKETS = tuple(1024 * 4**n for n in range(9))  # 1KB to 64MB
+
+
+def metrics_enabled() -> bool:
+    """Whether the /metrics endpoint is exposed."""
+    return os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+
+def _escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: dict) -> str:
+    """Format labels as {name="value",...} (empty string for no labels)."""
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label(value)}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Thread-safe histogram with labels, in the Prometheus text format.
+
+    Observations can come from the event loop and from render worker threads.
+    Observations made in render worker processes are not collected.
+    """
+
+    def __init__(self, name: str, description: str, label_names: tuple[str, ...] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = f"{METRICS_PREFIX}_{name}"
+        self.description = description
+        self.label_names = label_names
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [bucket counts..., count of values above the last bucket], sum
+        self._series: dict[tuple, tuple[list[int], list[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        """Record a value for the given label values."""
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][index] += 1
+            series[1][0] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time of a block, in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def totals(self) -> dict[tuple, tuple[int, float]]:
+        """Return (count, sum) for each set of label values."""
+        with self._lock:
+            return {key: (sum(counts), total[0]) for key, (counts, total) in self._series.items()}
+
+    def collect(self) -> list[str]:
+        """Return the histogram in the Prometheus text format."""
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((key, list(counts), total[0]) for key, (counts, total) in self._series.items())
+        for key, counts, total in series:
+            labels = dict(zip(self.label_names, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': _format_value(bound)})} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+class StatsCollector:
+    """Exposes the numeric fields of stats() dicts (caches, pools) as gauges and counters.
+
+    Sources are read at scrape time. Several sources can share a namespace and
+    are told apart by their labels, e.g. one source per cache.
+    """
+
+    def __init__(self):
+        self._sources: list[tuple[str, Callable[[], dict], dict, frozenset]] = []
+
+    def register(self, namespace: str, stats: Callable[[], dict], labels: dict = None, counters: tuple[str, ...] = ()):
+        """Register a stats() callable; fields named in counters are exposed as counters."""
+        self._sources.append((namespace, stats, labels or {}, frozenset(counters)))
+
+    def collect(self) -> list[str]:
+        """Return all registered stats in the Prometheus text format."""
+        samples: dict[str, tuple[str, list[str]]] = {}
+        for namespace, stats, labels, counters in self._sources:
+            try:
+                values = stats()
+            except Exception as e:
+                logger.error(f"Error collecting {namespace} metrics: {e}")
+                continue
+            for field, value in values.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                kind = "counter" if field in counters else "gauge"
+                name = f"{METRICS_PREFIX}_{namespace}_{field}" + ("_total" if kind == "counter" else "")
+                samples.setdefault(name, (kind, []))[1].append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        lines = []
+        for name, (kind, series) in samples.items():
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(series)
+        return lines
+
+
+# Request, render, database and document size metrics
+request_duration = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template.",
+    ("method", "route", "status"),
+)
+render_stage_duration = Histogram(
+    "render_stage_duration_seconds",
+    "Time spent in each stage of rendering a document.",
+    ("stage",),
+    buckets=STAGE_BUCKETS,
+)
+db_operation_duration = Histogram(
+    "db_operation_duration_seconds",
+    "MongoDB operation latency by db.py function.",
+    ("operation",),
+)
+document_size = Histogram(
+    "document_size_bytes",
+    "Size of markdown documents served or created.",
+    ("endpoint",),
+    buckets=SIZE_BUCKETS,
+)
+stats_collector = StatsCollector()
+
+HISTOGRAMS = [request_duration, render_stage_duration, db_operation_duration, document_size]
+
+
+def timed_db_operation(func):
+    """Decorator recording the latency of an async database function."""
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            db_operation_duration.observe(time.perf_counter() - start, operation=func.__name__)
+
+    return wrapper
+
+
+def render_metrics() -> str:
+    """Render every metric in the Prometheus text exposition format."""
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.collect())
+    lines.extend(stats_collector.collect())
+    return "\n".join(lines) + "\n"
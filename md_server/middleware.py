@@ -1,56 +1,96 @@
 """Middleware for logging HTTP requests and disabling caching."""
 
 import time
-from typing import Callable
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from .metrics import request_duration
 from .logging_config import get_logger
 
 logger = get_logger(__name__)
 
 
-class RequestLoggingMiddleware(BaseHTTPMiddleware):
+def route_label(scope: Scope) -> str:
+    """Route template of a request (e.g. /d/{md_id}), to keep metric labels bounded."""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    # Mounted apps (static files) only record their mount path
+    return scope.get("root_path") or "unmatched"
+
+
+class RequestLoggingMiddleware:
     """Middleware to log all HTTP requests and responses."""
 
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
         """Log request and response information."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
         start_time = time.time()
-        
+        method, path = scope["method"], scope["path"]
+
         # Log request
-        client_ip = request.client.host if request.client else "unknown"
-        logger.info(f"Request: {request.method} {request.url.path} from {client_ip}")
-        
+        client = scope.get("client")
+        client_ip = client[0] if client else "unknown"
+        logger.info(f"Request: {method} {path} from {client_ip}")
+        status = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                # Calculate processing time
+                process_time = time.time() - start_time
+
+                # Log response
+                logger.info(
+                    f"Response: {message['status']} for {method} {path} "
+                    f"({process_time:.3f}s)"
+                )
+
+                # Add processing time to response headers
+                headers = MutableHeaders(scope=message)
+                headers["X-Process-Time"] = str(process_time)
+            await send(message)
+
         # Process request
         try:
-            response = await call_next(request)
-            
-            # Calculate processing time
-            process_time = time.time() - start_time
-            
-            # Log response
-            logger.info(
-                f"Response: {response.status_code} for {request.method} {request.url.path} "
-                f"({process_time:.3f}s)"
-            )
-            
-            # Add processing time to response headers
-            response.headers["X-Process-Time"] = str(process_time)
-            
-            return response
-            
+            await self.app(scope, receive, send_wrapper)
         except Exception as e:
             process_time = time.time() - start_time
             logger.error(
-                f"Error processing {request.method} {request.url.path}: {e} "
+                f"Error processing {method} {path}: {e} "
                 f"({process_time:.3f}s)"
             )
             raise
-        
-class NoCacheMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request, call_next):
-        response = await call_next(request)
-        if request.url.path.startswith("/static/"):
-            response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
-            response.headers["Pragma"] = "no-cache"
-            response.headers["Expires"] = "0"
-        return response
\ No newline at end of file
+        finally:
+            # Full response time, including the body
+            request_duration.observe(
+                time.time() - start_time, method=method, route=route_label(scope), status=status
+            )
+
+
+class NoCacheMiddleware:
+    """Middleware to disable browser caching of static files (for development)."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not scope["path"].startswith("/static/"):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
+                headers["Pragma"] = "no-cache"
+                headers["Expires"] = "0"
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -1,9 +1,11 @@
 """Database models for the markdown server."""
 
-from beanie import Document
-from pydantic import Field
+from beanie import Document, PydanticObjectId
+from pydantic import BaseModel, Field
+from pymongo import ASCENDING, DESCENDING, IndexModel
 from typing import Optional
 import datetime
+import os
 from .logging_config import get_logger
 from uuid import uuid4
 
@@ -31,17 +33,61 @@ class MarkdownDocument(LoggedDocument):
     title: str
     content: str
     created_at: datetime.datetime = Field(default_factory=lambda: datetime.datetime.now(datetime.timezone.utc))
+    content_hash: Optional[str] = None # SHA-256 of content
+    rendered_html: Optional[str] = None # Rendered fragment (RENDER_ON_SAVE)
+    renderer_version: Optional[str] = None # Renderer version of rendered_html
+    content_storage: Optional[str] = None # None (inline content), "zlib" or "gridfs"
+    content_compressed: Optional[bytes] = None # zlib-compressed content
+    content_file_id: Optional[PydanticObjectId] = None # GridFS file holding the content
+    content_size: Optional[int] = None # UTF-8 size of content, if not stored inline
+    rendered_storage: Optional[str] = None # None (inline rendered_html), "zlib" or "gridfs"
+    rendered_compressed: Optional[bytes] = None # zlib-compressed rendered_html
+    rendered_file_id: Optional[PydanticObjectId] = None # GridFS file holding rendered_html
 
     class Settings:
         name = "md_server.documents"
+        indexes = [
+            # Keyset pagination for document listings (newest first)
+            IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)], name="created_at_id"),
+        ]
     
+class MarkdownDocumentMeta(BaseModel):
+    """Metadata-only projection of MarkdownDocument (no content or HTML)."""
+    id: Optional[PydanticObjectId] = Field(default=None, alias="_id")
+    doc_id: str
+    title: str
+    created_at: datetime.datetime
+    content_hash: Optional[str] = None
+
+class RenderSnippet(Document):
+    """Markdown stored by content hash for /r/{hash} (POST /r)."""
+    hash: str # SHA-256 of title and content
+    title: str
+    content: str
+    last_used: datetime.datetime = Field(default_factory=lambda: datetime.datetime.now(datetime.timezone.utc))
+
+    class Settings:
+        name = "md_server.snippets"
+        indexes = [
+            IndexModel([("hash", ASCENDING)], name="hash", unique=True),
+            # Snippets nobody has posted for SNIPPET_TTL_DAYS are removed
+            IndexModel(
+                [("last_used", ASCENDING)],
+                name="last_used_ttl",
+                expireAfterSeconds=int(os.getenv("SNIPPET_TTL_DAYS", "30")) * 86400,
+            ),
+        ]
+
 class APIKey(LoggedDocument):
-    hash: str = Field(index=True, unique=True)
+    hash: str # SHA-256 of the key
     description: Optional[str] = None
     created_at: datetime.datetime = Field(default_factory=lambda: datetime.datetime.now(datetime.timezone.utc))
 
     class Settings:
         name = "md_server.api_keys"
+        indexes = [
+            IndexModel([("hash", ASCENDING)], name="hash", unique=True),
+        ]
         
 class APIUsageLog(LoggedDocument):
     api_key: str
@@ -53,9 +99,13 @@ class APIUsageLog(LoggedDocument):
         name = "md_server.api_usage_logs"
         
 class User(LoggedDocument):
-    uid_sha256: str = Field(index=True, unique=True) # Hashed user ID from Authentik
+    uid_sha256: str # Hashed user ID from Authentik
     created_at: datetime.datetime = Field(default_factory=lambda: datetime.datetime.now(datetime.timezone.utc))
     name: Optional[str] = None
 
     class Settings:
-        name = "md_server.users"
\ No newline at end of file
+        name = "md_server.users"
+        indexes = [
+            # Makes get_or_create_user's upsert create at most one user per ID
+            IndexModel([("uid_sha256", ASCENDING)], name="uid_sha256", unique=True),
+        ]
\ No newline at end of file
@@ -0,0 +1,476 @@
+"""SQLite storage backend for single-node deployments (STORAGE_BACKEND=sqlite).
+
+Implements the storage functions of db.py on a local SQLite database in WAL
+mode. sqlite3 calls block, so they run in worker threads: reads on a small
+pool of connections (WAL readers don't block each other or the writer) and
+writes on a single connection, since SQLite allows one writer at a time.
+
+Documents are returned as the same models as with MongoDB, built with
+model_construct since Beanie is not initialized. IDs are ObjectId strings,
+so cursors and user IDs look the same with either backend.
+"""
+
+import asyncio
+import datetime
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+from bson import ObjectId
+from .models import MarkdownDocument, MarkdownDocumentMeta, APIKey, User, RenderSnippet
+from .cache import render_cache, page_cache, content_hash
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id TEXT PRIMARY KEY,
+    doc_id TEXT NOT NULL UNIQUE,
+    title TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    content_hash TEXT,
+    rendered_html TEXT,
+    renderer_version TEXT
+);
+-- Keyset pagination for document listings (newest first)
+CREATE INDEX IF NOT EXISTS documents_created_at_id ON documents (created_at DESC, id DESC);
+CREATE TABLE IF NOT EXISTS snippets (
+    hash TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    content TEXT NOT NULL,
+    last_used TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS snippets_last_used ON snippets (last_used);
+CREATE TABLE IF NOT EXISTS api_keys (
+    id TEXT PRIMARY KEY,
+    hash TEXT NOT NULL UNIQUE,
+    description TEXT,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS api_usage_logs (
+    id INTEGER PRIMARY KEY,
+    api_key TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    client_ip TEXT
+);
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    uid_sha256 TEXT NOT NULL UNIQUE,
+    created_at TEXT NOT NULL,
+    name TEXT
+);
+"""
+
+DOCUMENT_COLUMNS = "id, doc_id, title, content, created_at, content_hash, rendered_html, renderer_version"
+META_COLUMNS = "id, doc_id, title, created_at, content_hash"
+# Documents loaded at a time by rerender_documents
+RERENDER_BATCH_SIZE = 100
+
+
+def _timestamp(value: datetime.datetime) -> str:
+    """Format a datetime as sortable text in UTC (naive datetimes are taken as UTC)."""
+    if value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return value.isoformat(timespec="microseconds")
+
+
+def _datetime(value: str) -> datetime.datetime:
+    """Parse a stored timestamp as a naive UTC datetime, as MongoDB returns them."""
+    return datetime.datetime.fromisoformat(value)
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def _document(row: sqlite3.Row) -> MarkdownDocument:
+    return MarkdownDocument.model_construct(
+        id=ObjectId(row["id"]),
+        doc_id=row["doc_id"],
+        title=row["title"],
+        content=row["content"],
+        created_at=_datetime(row["created_at"]),
+        content_hash=row["content_hash"],
+        rendered_html=row["rendered_html"],
+        renderer_version=row["renderer_version"],
+    )
+
+
+def _meta(row: sqlite3.Row) -> MarkdownDocumentMeta:
+    return MarkdownDocumentMeta.model_construct(
+        id=ObjectId(row["id"]),
+        doc_id=row["doc_id"],
+        title=row["title"],
+        created_at=_datetime(row["created_at"]),
+        content_hash=row["content_hash"],
+    )
+
+
+def _api_key(row: sqlite3.Row) -> APIKey:
+    return APIKey.model_construct(
+        id=ObjectId(row["id"]),
+        hash=row["hash"],
+        description=row["description"],
+        created_at=_datetime(row["created_at"]),
+    )
+
+
+def _user(row: sqlite3.Row) -> User:
+    return User.model_construct(
+        id=ObjectId(row["id"]),
+        uid_sha256=row["uid_sha256"],
+        created_at=_datetime(row["created_at"]),
+        name=row["name"],
+    )
+
+
+def _document_values(document: MarkdownDocument) -> tuple:
+    return (
+        str(document.id),
+        document.doc_id,
+        document.title,
+        document.content,
+        _timestamp(document.created_at),
+        document.content_hash,
+        document.rendered_html,
+        document.renderer_version,
+    )
+
+
+def _new_document(title: str, content: str) -> MarkdownDocument:
+    return MarkdownDocument.model_construct(
+        id=ObjectId(), title=title, content=content, content_hash=content_hash(content)
+    )
+
+
+class SQLiteStorage:
+    """SQLite implementation of the db.py storage functions.
+
+    Methods have the same names and signatures as the db.py functions they
+    replace; MongoDB-only arguments (e.g. secondary_ok) are accepted and ignored.
+    """
+
+    def __init__(self, path: str, read_workers: int = 4, busy_timeout: float = 5.0, snippet_ttl_days: int = 30):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.snippet_ttl = datetime.timedelta(days=snippet_ttl_days)
+        self._readers = ThreadPoolExecutor(max_workers=read_workers, thread_name_prefix="sqlite-read")
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-write")
+        self._local = threading.local()
+        self._connections: list[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this worker thread's connection, opening it on first use."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.busy_timeout, check_same_thread=False)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            # With WAL, NORMAL only risks the last transactions on power loss, not corruption
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def _read_call(self, func: Callable[..., Any], args: tuple) -> Any:
+        return func(self._connection(), *args)
+
+    def _write_call(self, func: Callable[..., Any], args: tuple) -> Any:
+        connection = self._connection()
+        with connection:  # Commits, or rolls back on error
+            return func(connection, *args)
+
+    async def _read(self, func: Callable[..., Any], *args) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._readers, self._read_call, func, args)
+
+    async def _write(self, func: Callable[..., Any], *args) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._writer, self._write_call, func, args)
+
+    async def init(self):
+        """Create the schema and remove expired render snippets."""
+        logger.info(f"Opening SQLite database at: {self.path}")
+        expired = _timestamp(_now() - self.snippet_ttl)
+
+        def init_schema(connection: sqlite3.Connection):
+            connection.executescript(SCHEMA)
+            return connection.execute("DELETE FROM snippets WHERE last_used < ?", (expired,)).rowcount
+
+        removed = await self._write(init_schema)
+        logger.info(f"SQLite database ready ({removed} expired snippets removed)")
+
+    def close(self):
+        """Wait for pending operations and close every connection."""
+        self._readers.shutdown(wait=True)
+        self._writer.shutdown(wait=True)
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+        logger.info("SQLite database closed")
+
+    #* Document Operations
+    async def get_markdown_document(self, md_id: str, load: bool = True, secondary_ok: bool = False) -> MarkdownDocument | None:
+        logger.info(f"Fetching markdown document with ID: {md_id}")
+        row = await self._read(
+            lambda c: c.execute(f"SELECT {DOCUMENT_COLUMNS} FROM documents WHERE doc_id = ?", (md_id,)).fetchone()
+        )
+        if row is None:
+            logger.warning(f"No document found with ID: {md_id}")
+            return None
+        logger.info(f"Document found: {row['title']}")
+        return _document(row)
+
+    async def get_markdown_document_meta(self, md_id: str, secondary_ok: bool = False) -> MarkdownDocumentMeta | None:
+        logger.debug(f"Fetching markdown document metadata with ID: {md_id}")
+        row = await self._read(
+            lambda c: c.execute(f"SELECT {META_COLUMNS} FROM documents WHERE doc_id = ?", (md_id,)).fetchone()
+        )
+        return _meta(row) if row is not None else None
+
+    async def list_markdown_documents(self, limit: int = 50, after: tuple = None) -> list[MarkdownDocumentMeta]:
+        query, params = f"SELECT {META_COLUMNS} FROM documents", ()
+        if after is not None:
+            created_at, last_id = after
+            query += " WHERE (created_at, id) < (?, ?)"
+            params = (_timestamp(created_at), str(last_id))
+        query += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        rows = await self._read(lambda c: c.execute(query, (*params, limit)).fetchall())
+        return [_meta(row) for row in rows]
+
+    async def create_markdown_document(self, title: str, content: str, render: bool = None) -> MarkdownDocument:
+        from .db import render_on_save_enabled
+
+        logger.info(f"Creating new markdown document: {title}")
+        if render is None:
+            render = render_on_save_enabled()
+
+        document = _new_document(title, content)
+        if render:
+            from .md import render_stored_html, RENDERER_VERSION
+
+            document.rendered_html = await render_stored_html(content)
+            if document.rendered_html is not None:
+                document.renderer_version = RENDERER_VERSION
+        await self._write(
+            lambda c: c.execute(f"INSERT INTO documents ({DOCUMENT_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", _document_values(document))
+        )
+        logger.info(f"Document created with ID: {document.doc_id}")
+        return document
+
+    async def create_markdown_documents(self, items: list[tuple[str, str]], render: bool = None) -> list[str | Exception]:
+        from .db import render_on_save_enabled
+
+        logger.info(f"Creating {len(items)} markdown documents")
+        if render is None:
+            render = render_on_save_enabled()
+
+        documents = [_new_document(title, content) for title, content in items]
+        if render:
+            from .md import render_stored_html, RENDERER_VERSION
+
+            for document in documents:
+                document.rendered_html = await render_stored_html(document.content)
+                if document.rendered_html is not None:
+                    document.renderer_version = RENDERER_VERSION
+
+        def insert_all(connection: sqlite3.Connection) -> list[str | Exception]:
+            # One transaction for the batch; a failing row doesn't stop the rest
+            results: list[str | Exception] = []
+            for document in documents:
+                try:
+                    connection.execute(
+                        f"INSERT INTO documents ({DOCUMENT_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        _document_values(document),
+                    )
+                    results.append(document.doc_id)
+                except sqlite3.Error as e:
+                    results.append(RuntimeError(str(e)))
+            return results
+
+        results = await self._write(insert_all)
+        logger.info(f"Inserted {sum(isinstance(result, str) for result in results)} documents")
+        return results
+
+    async def delete_markdown_document(self, md_id: str) -> bool:
+        logger.info(f"Deleting markdown document with ID: {md_id}")
+        deleted = await self._write(lambda c: c.execute("DELETE FROM documents WHERE doc_id = ?", (md_id,)).rowcount)
+        if deleted:
+            render_cache.invalidate(md_id)
+            page_cache.invalidate(md_id)
+            logger.info(f"Document with ID: {md_id} deleted successfully")
+            return True
+        logger.warning(f"Cannot delete, no document found with ID: {md_id}")
+        return False
+
+    async def store_rendered_html(self, document: MarkdownDocument, html: str, version: str):
+        logger.debug(f"Storing rendered HTML for document: {document.doc_id} (renderer {version})")
+        digest = document.content_hash or content_hash(document.content)
+        await self._write(
+            lambda c: c.execute(
+                "UPDATE documents SET rendered_html = ?, renderer_version = ?, content_hash = ? WHERE doc_id = ?",
+                (html, version, digest, document.doc_id),
+            )
+        )
+        document.rendered_html, document.renderer_version, document.content_hash = html, version, digest
+
+    async def rerender_documents(self, force: bool = False) -> int:
+        from .md import render_stored_html, RENDERER_VERSION
+
+        logger.info(f"Re-rendering documents for renderer version {RENDERER_VERSION}")
+        # Keyset batches by id, so only RERENDER_BATCH_SIZE documents are in memory at once
+        query = f"SELECT {DOCUMENT_COLUMNS} FROM documents WHERE id > ?"
+        params = ()
+        if not force:
+            query += " AND (renderer_version IS NULL OR renderer_version != ?)"
+            params = (RENDERER_VERSION,)
+        query += " ORDER BY id LIMIT ?"
+
+        count = 0
+        last_id = ""
+        while True:
+            rows = await self._read(lambda c: c.execute(query, (last_id, *params, RERENDER_BATCH_SIZE)).fetchall())
+            if not rows:
+                break
+            last_id = rows[-1]["id"]
+            for row in rows:
+                document = _document(row)
+                html = await render_stored_html(document.content)
+                if html is None:
+                    logger.warning(f"Skipping document {document.doc_id}, which failed to render")
+                    continue
+                await self.store_rendered_html(document, html, RENDERER_VERSION)
+                render_cache.invalidate(document.doc_id)
+                page_cache.invalidate(document.doc_id)
+                count += 1
+        logger.info(f"Re-rendered {count} documents")
+        return count
+
+    #* Render Snippet Operations
+    async def store_snippet(self, hash: str, title: str, content: str):
+        logger.debug(f"Storing render snippet: {hash}")
+        await self._write(
+            lambda c: c.execute(
+                "INSERT INTO snippets (hash, title, content, last_used) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (hash) DO UPDATE SET last_used = excluded.last_used",
+                (hash, title, content, _timestamp(_now())),
+            )
+        )
+
+    async def get_snippet(self, hash: str) -> RenderSnippet | None:
+        logger.debug(f"Fetching render snippet: {hash}")
+        expired = _timestamp(_now() - self.snippet_ttl)
+        row = await self._read(
+            lambda c: c.execute(
+                "SELECT hash, title, content, last_used FROM snippets WHERE hash = ? AND last_used >= ?", (hash, expired)
+            ).fetchone()
+        )
+        if row is None:
+            return None
+        return RenderSnippet.model_construct(
+            hash=row["hash"], title=row["title"], content=row["content"], last_used=_datetime(row["last_used"])
+        )
+
+    async def touch_snippet(self, hash: str) -> bool:
+        logger.debug(f"Touching render snippet: {hash}")
+        expired = _timestamp(_now() - self.snippet_ttl)
+        # Look up first, so requests for unknown hashes don't wait for the writer
+        row = await self._read(
+            lambda c: c.execute("SELECT 1 FROM snippets WHERE hash = ? AND last_used >= ?", (hash, expired)).fetchone()
+        )
+        if row is None:
+            return False
+        cursor = await self._write(
+            lambda c: c.execute(
+                "UPDATE snippets SET last_used = ? WHERE hash = ? AND last_used >= ?", (_timestamp(_now()), hash, expired)
+            )
+        )
+        return cursor.rowcount > 0
+
+    async def count_snippets(self) -> int:
+        return await self._read(lambda c: c.execute("SELECT count(*) FROM snippets").fetchone()[0])
+
+    #* API Key Operations
+    async def create_api_key(self, hash: str, description: str = None) -> APIKey:
+        logger.info(f"Creating new API key: {description or 'No description'}")
+        api_key = APIKey.model_construct(id=ObjectId(), hash=hash, description=description)
+        await self._write(
+            lambda c: c.execute(
+                "INSERT INTO api_keys (id, hash, description, created_at) VALUES (?, ?, ?, ?)",
+                (str(api_key.id), hash, description, _timestamp(api_key.created_at)),
+            )
+        )
+        logger.info(f"API key created with ID: {api_key.id}")
+        return api_key
+
+    async def get_api_key(self, hash: str) -> APIKey | None:
+        logger.info(f"Fetching API key with hash: {hash}")
+        row = await self._read(
+            lambda c: c.execute("SELECT id, hash, description, created_at FROM api_keys WHERE hash = ?", (hash,)).fetchone()
+        )
+        if row is None:
+            logger.warning(f"No API key found with hash: {hash}")
+            return None
+        logger.info(f"API key found: {row['description'] or 'No description'}")
+        return _api_key(row)
+
+    async def delete_api_key(self, hash: str) -> bool:
+        logger.info(f"Deleting API key with hash: {hash}")
+        deleted = await self._write(lambda c: c.execute("DELETE FROM api_keys WHERE hash = ?", (hash,)).rowcount)
+        if not deleted:
+            logger.warning(f"Cannot delete, no API key found with hash: {hash}")
+        return bool(deleted)
+
+    async def list_api_keys(self) -> list[APIKey]:
+        logger.info("Listing all API keys")
+        rows = await self._read(
+            lambda c: c.execute("SELECT id, hash, description, created_at FROM api_keys ORDER BY created_at").fetchall()
+        )
+        logger.info(f"Total API keys found: {len(rows)}")
+        return [_api_key(row) for row in rows]
+
+    async def log_api_usage(self, api_key: str, endpoint: str, client_ip: str = None):
+        await self.log_api_usage_batch([{"api_key": api_key, "endpoint": endpoint, "client_ip": client_ip}])
+
+    async def log_api_usage_batch(self, events: list[dict]):
+        if not events:
+            return
+        logger.debug(f"Writing batch of {len(events)} API usage events")
+        rows = [
+            (event["api_key"], event["endpoint"], _timestamp(event.get("timestamp") or _now()), event.get("client_ip"))
+            for event in events
+        ]
+        await self._write(
+            lambda c: c.executemany(
+                "INSERT INTO api_usage_logs (api_key, endpoint, timestamp, client_ip) VALUES (?, ?, ?, ?)", rows
+            )
+        )
+
+    #* User Operations
+    async def get_user(self, uid_sha256: str) -> User | None:
+        logger.debug(f"Fetching user with ID hash: {uid_sha256}")
+        row = await self._read(
+            lambda c: c.execute("SELECT id, uid_sha256, created_at, name FROM users WHERE uid_sha256 = ?", (uid_sha256,)).fetchone()
+        )
+        return _user(row) if row is not None else None
+
+    async def get_or_create_user(self, uid_sha256: str, name: str = None) -> User:
+        logger.debug(f"Fetching or creating user with ID hash: {uid_sha256}")
+
+        def upsert(connection: sqlite3.Connection) -> sqlite3.Row:
+            connection.execute(
+                "INSERT INTO users (id, uid_sha256, created_at, name) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (uid_sha256) DO NOTHING",
+                (str(ObjectId()), uid_sha256, _timestamp(_now()), name),
+            )
+            return connection.execute(
+                "SELECT id, uid_sha256, created_at, name FROM users WHERE uid_sha256 = ?", (uid_sha256,)
+            ).fetchone()
+
+        return _user(await self._write(upsert))
@@ -0,0 +1,78 @@
+"""Startup time report (md-server run --startup-profile)."""
+
+import importlib
+import os
+import sys
+import time
+from contextlib import contextmanager
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Set by `md-server run --startup-profile`, and inherited by reload workers
+STARTUP_PROFILE_ENV = "STARTUP_PROFILE"
+
+# Imported one after another, so each line only counts what the previous
+# ones didn't already import
+IMPORT_GROUPS = [
+    ("fastapi", "fastapi"),
+    ("pydantic", "pydantic"),
+    ("motor", "motor.motor_asyncio"),
+    ("beanie", "beanie"),
+    ("markdown-it", "markdown_it"),
+    ("jinja2", "jinja2"),
+    ("md_server.md", "md_server.md"),
+    ("md_server.db", "md_server.db"),
+    ("md_server.main", "md_server.main"),
+]
+
+
+def startup_profile_enabled() -> bool:
+    """Whether startup phases are timed and reported."""
+    return os.getenv(STARTUP_PROFILE_ENV, "false").lower() == "true"
+
+
+class StartupProfile:
+    """Records how long each startup phase takes."""
+
+    def __init__(self):
+        self.phases: list[tuple[str, float]] = []
+        self.started = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time a block as a named phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def report(self) -> list[str]:
+        """Format the recorded phases, slowest first."""
+        total = time.perf_counter() - self.started
+        lines = [f"Startup profile ({total * 1000:.0f}ms since profiling started):"]
+        for name, seconds in sorted(self.phases, key=lambda phase: phase[1], reverse=True):
+            lines.append(f"  {seconds * 1000:8.1f}ms  {name}")
+        return lines
+
+
+startup_profile = StartupProfile()
+
+
+def profile_imports():
+    """Import the app's dependencies group by group, timing each group.
+
+    Modules that were already imported (e.g. by the CLI) cost nothing here.
+    """
+    for label, module in IMPORT_GROUPS:
+        name = f"import {label}" + (" (already imported)" if module in sys.modules else "")
+        with startup_profile.phase(name):
+            importlib.import_module(module)
+
+
+def log_startup_profile():
+    """Log the startup report, if profiling is enabled."""
+    if startup_profile_enabled():
+        for line in startup_profile.report():
+            logger.info(line)
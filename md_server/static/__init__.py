@@ -1,5 +1,60 @@
 """Static files for the markdown server."""
 
-from fastapi.staticfiles import StaticFiles
+import os
+from starlette.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.types import Scope
+from ..assets import ASSET_CACHE_CONTROL, Asset, build_assets
+from ..compression import encoded_response
+from ..etag import etag_matches, cache_headers, not_modified
 
-static_files = StaticFiles(directory="md_server/static", html=True)
\ No newline at end of file
+STATIC_DIR = "md_server/static"
+
+# Serve minified assets under content-hashed names (see assets.py)
+STATIC_FINGERPRINT = os.getenv("STATIC_FINGERPRINT", "true").lower() == "true"
+_assets: dict[str, Asset] | None = None
+_assets_by_path: dict[str, Asset] = {}
+
+
+def get_assets() -> dict[str, Asset]:
+    """Built assets by original name, built on first use (or at app startup)."""
+    global _assets, _assets_by_path
+    if _assets is None:
+        assets = build_assets(STATIC_DIR) if STATIC_FINGERPRINT else {}
+        _assets_by_path = {asset.path: asset for asset in assets.values()}
+        _assets = assets
+    return _assets
+
+
+def static_url(name: str) -> str:
+    """URL of a static file, fingerprinted if it is a built asset."""
+    asset = get_assets().get(name)
+    return f"/static/{asset.path if asset else name}"
+
+
+class AssetStaticFiles(StaticFiles):
+    """StaticFiles that serves built assets from memory with long-lived caching.
+
+    Original file names are still served from disk, for pages cached before
+    an upgrade and for external links.
+    """
+
+    async def get_response(self, path: str, scope: Scope):
+        get_assets()
+        asset = _assets_by_path.get(path)
+        if asset is None or scope["method"] not in ("GET", "HEAD"):
+            return await super().get_response(path, scope)
+
+        headers = Headers(scope=scope)
+        matched = etag_matches(headers.get("if-none-match"), asset.etag)
+        if matched:
+            return not_modified(matched, ASSET_CACHE_CONTROL)
+        return encoded_response(
+            asset.variants,
+            headers.get("accept-encoding"),
+            media_type=asset.media_type,
+            headers=cache_headers(asset.etag, ASSET_CACHE_CONTROL),
+        )
+
+
+static_files = AssetStaticFiles(directory=STATIC_DIR, html=True)
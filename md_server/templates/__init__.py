@@ -1,5 +1,26 @@
 """Template files for the markdown server."""
 
-from fastapi.templating import Jinja2Templates
+import hashlib
+from pathlib import Path
+from starlette.templating import Jinja2Templates
+from ..assets import source_fingerprint
+from ..static import STATIC_DIR, STATIC_FINGERPRINT, static_url
 
-templates = Jinja2Templates(directory="md_server/templates")
\ No newline at end of file
+TEMPLATE_DIR = "md_server/templates"
+
+templates = Jinja2Templates(directory=TEMPLATE_DIR)
+templates.env.globals["static_url"] = static_url
+
+
+def _fingerprint_templates() -> str:
+    """Hash all template files and asset URLs, so cached pages are invalidated when either changes."""
+    digest = hashlib.sha256()
+    for path in sorted(Path(TEMPLATE_DIR).glob("*.html")):
+        digest.update(path.name.encode("utf-8"))
+        digest.update(path.read_bytes())
+    if STATIC_FINGERPRINT:
+        digest.update(source_fingerprint(STATIC_DIR).encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
+TEMPLATE_VERSION = _fingerprint_templates()
@@ -0,0 +1,135 @@
+"""Batched, asynchronous API usage logging."""
+
+import asyncio
+import datetime
+import os
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class UsageLogger:
+    """Queues API usage events and writes them to the database in batches.
+
+    Events are flushed by a background task once batch_size events are
+    queued or every flush_interval seconds, whichever comes first. When the
+    queue is full, new events are dropped (and counted) rather than slowing
+    down requests. The queue is created by start(), on the running event
+    loop; events recorded before that are dropped too.
+    """
+
+    def __init__(self, max_queue: int = 10000, batch_size: int = 500, flush_interval: float = 5.0):
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: asyncio.Queue | None = None
+        self._batch_ready: asyncio.Event | None = None
+        self._stopping: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+
+        # Metrics
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+    def record(self, api_key: str, endpoint: str, client_ip: str = None):
+        """Queue a usage event without waiting for it to be written."""
+        event = {
+            "api_key": api_key,
+            "endpoint": endpoint,
+            "client_ip": client_ip,
+            "timestamp": datetime.datetime.now(datetime.timezone.utc),
+        }
+        if self._queue is None:
+            self._drop("Usage log writer not started")
+            return
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self._drop("Usage log queue full")
+            return
+
+        if self._queue.qsize() >= self.batch_size:
+            self._batch_ready.set()
+
+    def _drop(self, reason: str, count: int = 1):
+        """Count dropped events, logging now and then."""
+        previous, self.dropped = self.dropped, self.dropped + count
+        if previous == 0 or previous // 1000 != self.dropped // 1000:
+            logger.warning(f"{reason}, {self.dropped} events dropped so far")
+
+    async def start(self):
+        """Create the queue and start the background flush task."""
+        if self._task is None:
+            logger.info("Starting usage log writer")
+            if self._queue is None:
+                self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._batch_ready = asyncio.Event()
+            self._stopping = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background task once it has written all queued events."""
+        if self._task is not None:
+            self._stopping.set()
+            self._batch_ready.set()  # Wake the task up now rather than at the next interval
+            await self._task
+            self._task = None
+        logger.info(f"Usage log writer stopped ({self.written} written, {self.dropped} dropped, {self.failed} failed)")
+
+    async def _run(self):
+        """Flush queued events whenever a batch is ready or the interval passes, until stopped."""
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._batch_ready.clear()
+            await self.flush()
+        await self.flush()  # Events recorded during the last write
+
+    async def flush(self):
+        """Write all currently queued events, batch_size at a time."""
+        from .db import log_api_usage_batch
+
+        while self._queue is not None and not self._queue.empty():
+            batch = []
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await log_api_usage_batch(batch)
+                self.written += len(batch)
+                self.batches += 1
+            except asyncio.CancelledError:
+                self._requeue(batch)  # Written by the next flush, if there is one
+                raise
+            except Exception as e:
+                self.failed += len(batch)
+                logger.error(f"Failed to write {len(batch)} usage log events: {e}")
+
+    def _requeue(self, batch: list[dict]):
+        """Put the events of an interrupted write back in the queue."""
+        for i, event in enumerate(batch):
+            try:
+                self._queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self._drop("Usage log queue full", len(batch) - i)
+                return
+
+    def stats(self) -> dict:
+        """Return queue and write counters."""
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "batches": self.batches,
+        }
+
+
+usage_logger = UsageLogger(
+    max_queue=int(os.getenv("USAGE_LOG_QUEUE_SIZE", "10000")),
+    batch_size=int(os.getenv("USAGE_LOG_BATCH_SIZE", "500")),
+    flush_interval=float(os.getenv("USAGE_LOG_FLUSH_INTERVAL", "5")),
+)
@@ -0,0 +1,53 @@
+"""API key verification caching and the invalid key limit."""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from md_server import auth
+from md_server.main import app
+
+VALID_KEY = "valid"
+
+
+@pytest.fixture
+def client(monkeypatch):
+    lookups = []
+
+    async def get_api_key(hashed_key):
+        lookups.append(hashed_key)
+        return "record" if hashed_key == auth.hash_api_key(VALID_KEY) else None
+
+    monkeypatch.setattr(auth, "get_api_key", get_api_key)
+    monkeypatch.setattr(auth.usage_logger, "record", lambda **kwargs: None)
+    monkeypatch.setattr(auth, "API_KEY_FAILURE_LIMIT", 3)
+    for cache in (auth.api_key_cache, auth.api_key_negative_cache, auth.api_key_failures):
+        cache.clear()
+    client = TestClient(app)
+    client.lookups = lookups
+    return client
+
+
+def get_stats(client, key):
+    return client.get("/api/cache/stats", headers={"X-API-Key": key})
+
+
+def test_keys_are_cached(client):
+    assert get_stats(client, VALID_KEY).status_code == 200
+    assert get_stats(client, VALID_KEY).status_code == 200
+    assert get_stats(client, "invalid").status_code == 403
+    assert get_stats(client, "invalid").status_code == 403
+    assert len(client.lookups) == 2
+    assert auth.api_key_negative_cache.stats()["entries"] == 1
+
+    auth.invalidate_api_key(auth.hash_api_key("invalid"))
+    assert auth.api_key_negative_cache.stats()["entries"] == 0
+
+
+def test_invalid_keys_are_limited_per_client(client):
+    assert [get_stats(client, f"guess {i}").status_code for i in range(3)] == [403] * 3
+    response = get_stats(client, "guess 3")
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "60"
+    # Rejected before the lookup, even with a valid key
+    assert get_stats(client, VALID_KEY).status_code == 429
+    assert len(client.lookups) == 3
@@ -0,0 +1,41 @@
+"""Render benchmark suite, on small corpora."""
+
+from md_server.bench import (
+    CORPUS_PRESETS,
+    compare_admonitions,
+    compare_runs,
+    compare_sanitizers,
+    generate_corpus,
+    run_suite,
+)
+
+
+def test_generate_corpus_is_deterministic():
+    text = generate_corpus(4096, **CORPUS_PRESETS["mixed"])
+    assert len(text.encode("utf-8")) >= 4096
+    assert text == generate_corpus(4096, **CORPUS_PRESETS["mixed"])
+    assert text != generate_corpus(4096, seed=1, **CORPUS_PRESETS["mixed"])
+
+
+def test_run_suite():
+    run = run_suite(sizes=[2048], repeat=1)
+    names = [row["corpus"] for row in run["results"]]
+    assert names == ["HOME_PAGE"] + [f"{preset}-2KB" for preset in CORPUS_PRESETS]
+    for row in run["results"]:
+        assert row["render_markdown_s"] > 0
+        assert {"parse", "render", "template"} <= set(row["stages_s"])
+
+    comparison = compare_runs(run, run)
+    assert [row["corpus"] for row in comparison] == names
+
+
+def test_admonition_renderer_matches_legacy_pass():
+    results = compare_admonitions(sizes=[4096], repeat=1)
+    assert [row["corpus"] for row in results] == ["HOME_PAGE", "4KB"]
+    assert all(row["identical"] for row in results), results
+
+
+def test_sanitizers_match():
+    results = compare_sanitizers(sizes=[4096], repeat=1)
+    assert [row["corpus"] for row in results] == ["HOME_PAGE", "4KB"]
+    assert all(row["identical"] for row in results), results
@@ -0,0 +1,52 @@
+"""Editor block and streamed chunk rendering against a full render."""
+
+import pytest
+
+from md_server.md import (
+    MarkdownRenderer,
+    SanitizingRenderer,
+    create_markdown_it,
+    render_markdown,
+    render_markdown_blocks,
+    render_markdown_chunks,
+)
+
+PARSERS = {
+    "bleach": create_markdown_it(MarkdownRenderer),
+    "renderer": create_markdown_it(SanitizingRenderer),
+}
+
+DOCUMENTS = [
+    "# Title\n\nSome *text* with a [link][ref].\n\n[ref]: https://example.com\n",
+    "# Same\n\n## Same\n\n# Same\n",
+    "- one\n- two\n\n> quote\n\n```python\nprint(1)\n```\n",
+    "!!! note \"Title\"\n    Admonition body\n\nAfter\n",
+    "| a | b |\n|---|---|\n| 1 | 2 |\n",
+    "<div>\n\n*inside*\n\n</div>\n\nafter\n",
+    "<table><tr>\n\nrest\n",
+    "</div>\n\nafter\n",
+    "a <b>bold\n\nnext\n",
+    "<div><span>\n\nmore\n\n</span></div>\n",
+]
+
+
+@pytest.mark.parametrize("sanitizer", ["bleach", "renderer"])
+@pytest.mark.parametrize("text", DOCUMENTS)
+def test_blocks_join_to_full_render(monkeypatch, sanitizer, text):
+    monkeypatch.setattr("md_server.md.HTML_SANITIZER", sanitizer)
+    monkeypatch.setattr("md_server.md.RENDERER_VERSION", f"test-{sanitizer}")
+    monkeypatch.setattr("md_server.md.get_markdown_it", lambda: PARSERS[sanitizer])
+    blocks = render_markdown_blocks(text)
+    assert "".join(html for _, html in blocks) == render_markdown(text)
+    # Rendered again, unchanged blocks come from the block cache
+    assert render_markdown_blocks(text) == blocks
+
+
+@pytest.mark.parametrize("sanitizer", ["bleach", "renderer"])
+@pytest.mark.parametrize("text", DOCUMENTS + ["a <b>bold\n\nnext para\n\n" * 3])
+def test_chunks_join_to_full_render(monkeypatch, sanitizer, text):
+    monkeypatch.setattr("md_server.md.HTML_SANITIZER", sanitizer)
+    monkeypatch.setattr("md_server.md.get_markdown_it", lambda: PARSERS[sanitizer])
+    # Small chunks, so documents without raw HTML are split
+    chunks = list(render_markdown_chunks(text, chunk_size=1))
+    assert "".join(chunks) == render_markdown(text)
@@ -0,0 +1,55 @@
+"""Accept-Encoding negotiation and precompressed responses."""
+
+import gzip
+
+import pytest
+
+from md_server.compression import compress_variants, encoded_response, negotiate_encoding
+
+ALL = {"br": b"", "gzip": b"", "identity": b""}
+NO_BROTLI = {"gzip": b"", "identity": b""}
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, available, expected",
+    [
+        (None, ALL, "identity"),
+        ("", ALL, "identity"),
+        ("gzip, deflate, br", ALL, "br"),
+        ("gzip, deflate, br", NO_BROTLI, "gzip"),
+        ("GZIP", ALL, "gzip"),
+        ("br;q=0.5, gzip;q=0.8", ALL, "gzip"),
+        ("br; q=0.9, gzip; Q=0.1", ALL, "br"),
+        ("gzip;level=1;q=0.2, br;q=0.1", ALL, "gzip"),
+        ("br;q=0, gzip;q=0", ALL, "identity"),
+        ("br;q=bogus, gzip", ALL, "gzip"),
+        ("*", ALL, "br"),
+        ("*;q=0.5, br;q=0", ALL, "gzip"),
+        ("identity;q=0.5, *;q=0", ALL, "identity"),
+        ("br", {"identity": b""}, "identity"),
+        ("deflate", ALL, "identity"),
+    ],
+)
+def test_negotiate_encoding(accept_encoding, available, expected):
+    assert negotiate_encoding(accept_encoding, available) == expected
+
+
+def test_encoded_response_tags_the_encoding():
+    body = b"<p>compressible</p>" * 200
+    variants = compress_variants(body)
+    assert gzip.decompress(variants["gzip"]) == body
+
+    response = encoded_response(variants, "gzip", "text/html", headers={"ETag": '"abc"'})
+    assert response.body == variants["gzip"]
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == '"abc-gzip"'
+    assert response.headers["vary"] == "Accept-Encoding"
+
+    response = encoded_response(variants, None, "text/html", headers={"ETag": '"abc"'})
+    assert response.body == body
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == '"abc"'
+
+
+def test_small_bodies_are_not_compressed():
+    assert compress_variants(b"tiny") == {"identity": b"tiny"}
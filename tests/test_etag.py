@@ -0,0 +1,61 @@
+"""ETags of compressed representations and conditional requests."""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from md_server.etag import encoding_etag, etag_matches, make_etag, not_modified
+
+ETAG = make_etag("abc", "1")
+
+
+def test_encoding_etag():
+    assert ETAG == '"abc-1"'
+    assert encoding_etag(ETAG, "br") == '"abc-1-br"'
+    assert encoding_etag(ETAG, "gzip") == '"abc-1-gzip"'
+    assert encoding_etag(ETAG, "identity") == ETAG
+
+
+@pytest.mark.parametrize(
+    "if_none_match, expected",
+    [
+        (None, None),
+        ("", None),
+        ('"abc-1"', '"abc-1"'),
+        ('W/"abc-1"', '"abc-1"'),
+        ('"abc-1-br"', '"abc-1-br"'),
+        ('W/"abc-1-gzip"', '"abc-1-gzip"'),
+        ('"other", "abc-1-gzip"', '"abc-1-gzip"'),
+        (' "other" ,W/"abc-1" ', '"abc-1"'),
+        ("*", '"abc-1"'),
+        ('"abc-1-deflate"', None),
+        ('"abc-2"', None),
+        ("abc-1", None),
+    ],
+)
+def test_etag_matches(if_none_match, expected):
+    assert etag_matches(if_none_match, ETAG) == expected
+
+
+def test_not_modified():
+    response = not_modified('"abc-1-br"', "no-cache")
+    assert response.status_code == 304
+    assert response.headers["etag"] == '"abc-1-br"'
+    assert response.headers["cache-control"] == "no-cache"
+    assert response.headers["vary"] == "Accept-Encoding"
+
+
+def test_revalidation_echoes_the_encoding_etag():
+    from md_server.main import app
+    from md_server.static import static_url
+
+    client = TestClient(app)
+    url = static_url("github-markdown.css")
+    response = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert etag.endswith('-gzip"')
+
+    response = client.get(url, headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert response.headers["vary"] == "Accept-Encoding"
@@ -0,0 +1,102 @@
+"""The renderer-level sanitizer against bleach (HTML_SANITIZER=renderer vs bleach)."""
+
+from html.parser import HTMLParser
+
+import pytest
+
+from md_server.md import MarkdownRenderer, SanitizingRenderer, clean_html, create_markdown_it
+
+renderer_md = create_markdown_it(SanitizingRenderer)
+bleach_md = create_markdown_it(MarkdownRenderer)
+
+
+def render_renderer(text: str) -> str:
+    return renderer_md.render(text)
+
+
+def render_bleach(text: str) -> str:
+    return clean_html(bleach_md.render(text))
+
+
+class TagChecker(HTMLParser):
+    """Collects link targets and checks that tags are balanced."""
+
+    VOID = {"br", "hr", "img"}
+
+    def __init__(self):
+        super().__init__()
+        self.stack = []
+        self.urls = []
+        self.balanced = True
+
+    def handle_starttag(self, tag, attrs):
+        self.urls += [value for name, value in attrs if name in ("href", "src")]
+        if tag not in self.VOID:
+            self.stack.append(tag)
+
+    def handle_endtag(self, tag):
+        if not self.stack or self.stack.pop() != tag:
+            self.balanced = False
+
+
+def check(html: str) -> TagChecker:
+    checker = TagChecker()
+    checker.feed(html)
+    checker.close()
+    assert checker.balanced and not checker.stack, html
+    return checker
+
+
+UNSAFE_URLS = [
+    '<a href="java&#x09;script:alert(1)">x</a>',
+    '<a href="java\nscript:alert(1)">x</a>',
+    '<a href="\x01javascript:alert(1)">x</a>',
+    '<a href="javascript\n:x">x</a>',
+    '<a href=" JavaScript:alert(1)">x</a>',
+    '<img src="vbscript:msgbox(1)" alt="x">',
+]
+
+
+@pytest.mark.parametrize("text", UNSAFE_URLS)
+def test_unsafe_urls_are_removed(text):
+    renderer_html, bleach_html = render_renderer(text), render_bleach(text)
+    assert check(renderer_html).urls == check(bleach_html).urls == []
+    assert renderer_html == bleach_html
+
+
+SAFE_URLS = [
+    '<a href="https://example.com/">x</a>',
+    '<a href="mailto:someone@example.com">x</a>',
+    '<a href="/relative/path:with-colon">x</a>',
+    '<a href="#section">x</a>',
+    "[link](https://example.com/?q=1)",
+]
+
+
+@pytest.mark.parametrize("text", SAFE_URLS)
+def test_safe_urls_are_kept(text):
+    renderer_html, bleach_html = render_renderer(text), render_bleach(text)
+    assert check(renderer_html).urls == check(bleach_html).urls != []
+
+
+UNBALANCED_HTML = [
+    "</div>\n\nafter",
+    "text </div> more",
+    "<td>cell",
+    "<table><tr>\n\nrest",
+    "<div>\n\nnever closed",
+    "a <b>bold\n\nnext",
+    "<div>\n\n*inside*\n\n</div>",
+    "<div><span>\n\n</div>",
+]
+
+
+@pytest.mark.parametrize("text", UNBALANCED_HTML)
+def test_raw_tags_are_balanced(text):
+    check(render_renderer(text))
+    check(render_bleach(text))
+
+
+@pytest.mark.parametrize("text", ["</div>\n\nafter", "text </div> more", "<td>cell", "<div>\n\n*inside*\n\n</div>"])
+def test_raw_tags_match_bleach(text):
+    assert render_renderer(text) == render_bleach(text)
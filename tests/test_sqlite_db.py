@@ -0,0 +1,131 @@
+"""SQLite storage backend, against a temporary database file."""
+
+import asyncio
+import datetime
+import itertools
+
+import pytest
+
+from md_server.sqlite_db import SQLiteStorage, _timestamp
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "md-server.db"), snippet_ttl_days=1)
+    run(storage.init())
+    yield storage
+    storage.close()
+
+
+def test_document_lifecycle(storage):
+    created = run(storage.create_markdown_document("Title", "# Hello\n\ntext", render=True))
+    assert created.rendered_html.startswith('<h1 id="hello">')
+
+    document = run(storage.get_markdown_document(created.doc_id))
+    assert (document.id, document.title, document.content) == (created.id, "Title", "# Hello\n\ntext")
+    assert document.content_hash == created.content_hash
+    assert document.rendered_html == created.rendered_html
+    assert document.renderer_version == created.renderer_version
+
+    meta = run(storage.get_markdown_document_meta(created.doc_id))
+    assert (meta.id, meta.doc_id, meta.title, meta.content_hash) == (
+        created.id,
+        created.doc_id,
+        "Title",
+        created.content_hash,
+    )
+
+    assert run(storage.delete_markdown_document(created.doc_id)) is True
+    assert run(storage.get_markdown_document(created.doc_id)) is None
+    assert run(storage.get_markdown_document_meta(created.doc_id)) is None
+    assert run(storage.delete_markdown_document(created.doc_id)) is False
+
+
+def test_list_pages_through_tied_created_at(storage):
+    results = run(storage.create_markdown_documents([(f"doc {i}", f"text {i}") for i in range(5)], render=False))
+    # Same creation time for every document, so only the id orders them
+    tied = _timestamp(datetime.datetime(2026, 1, 1))
+    run(storage._write(lambda c: c.execute("UPDATE documents SET created_at = ?", (tied,))))
+
+    seen, after = [], None
+    while page := run(storage.list_markdown_documents(limit=2, after=after)):
+        seen.extend(page)
+        after = (page[-1].created_at, page[-1].id)
+
+    assert sorted(meta.doc_id for meta in seen) == sorted(results)
+    assert [meta.id for meta in seen] == sorted((meta.id for meta in seen), reverse=True)
+
+
+def test_create_many_reports_failed_rows(storage, monkeypatch):
+    # The third document reuses the first one's doc_id and violates its unique constraint
+    doc_ids = iter(["first", "second", "first", "fourth"])
+    monkeypatch.setattr("md_server.models.uuid4", lambda: next(doc_ids))
+    results = run(storage.create_markdown_documents([(f"doc {i}", f"text {i}") for i in range(4)], render=False))
+
+    assert results[:2] == ["first", "second"] and results[3] == "fourth"
+    assert isinstance(results[2], RuntimeError)
+    assert run(storage.get_markdown_document("first")).title == "doc 0"
+    assert run(storage.get_markdown_document("fourth")).title == "doc 3"
+
+
+def test_snippets_expire(storage):
+    run(storage.store_snippet("fresh", "Fresh", "# fresh"))
+    run(storage.store_snippet("stale", "Stale", "# stale"))
+    old = _timestamp(datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=2))
+    run(storage._write(lambda c: c.execute("UPDATE snippets SET last_used = ? WHERE hash = 'stale'", (old,))))
+
+    snippet = run(storage.get_snippet("fresh"))
+    assert (snippet.title, snippet.content) == ("Fresh", "# fresh")
+    assert run(storage.touch_snippet("fresh")) is True
+
+    assert run(storage.get_snippet("stale")) is None
+    assert run(storage.touch_snippet("stale")) is False
+    assert run(storage.touch_snippet("unknown")) is False
+
+    # Posting an expired snippet again revives it
+    run(storage.store_snippet("stale", "Stale", "# stale"))
+    assert run(storage.get_snippet("stale")) is not None
+    assert run(storage.count_snippets()) == 2
+
+
+def test_get_or_create_user_is_idempotent(storage):
+    assert run(storage.get_user("uid")) is None
+
+    async def create_concurrently():
+        return await asyncio.gather(*(storage.get_or_create_user("uid", name=f"User {i}") for i in range(5)))
+
+    users = run(create_concurrently())
+    assert len({user.id for user in users}) == 1
+    assert run(storage.get_or_create_user("uid", name="Other")).id == users[0].id
+    assert run(storage.get_user("uid")).name == users[0].name
+
+
+def test_rerender_documents_in_batches(storage, monkeypatch):
+    monkeypatch.setattr("md_server.sqlite_db.RERENDER_BATCH_SIZE", 2)
+    doc_ids = run(storage.create_markdown_documents([(f"doc {i}", f"# Doc {i}") for i in range(5)], render=False))
+
+    assert run(storage.rerender_documents()) == 5
+    for i, doc_id in enumerate(doc_ids):
+        assert run(storage.get_markdown_document(doc_id)).rendered_html == f'<h1 id="doc-{i}">Doc {i}</h1>\n'
+    # Already rendered by this renderer version, unless forced
+    assert run(storage.rerender_documents()) == 0
+    assert run(storage.rerender_documents(force=True)) == 5
+
+
+def test_rerender_skips_failed_documents(storage, monkeypatch):
+    monkeypatch.setattr("md_server.sqlite_db.RERENDER_BATCH_SIZE", 2)
+    doc_ids = run(storage.create_markdown_documents([(f"doc {i}", f"# Doc {i}") for i in range(5)], render=False))
+    calls = itertools.count()
+
+    async def render_stored_html(md_text):
+        next(calls)
+        return None if md_text == "# Doc 2" else f"<p>{md_text}</p>"
+
+    monkeypatch.setattr("md_server.md.render_stored_html", render_stored_html)
+    assert run(storage.rerender_documents()) == 4
+    assert next(calls) == 5
+    assert run(storage.get_markdown_document(doc_ids[2])).rendered_html is None